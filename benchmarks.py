@@ -0,0 +1,251 @@
+"""Benchmarks for the serial and magnet code paths, with stored baselines
+
+Everything runs without hardware or network: the optimizer talks to the
+in-process SimulatedArduino and the magnet benchmarks only compute.
+
+    python benchmarks.py run --compare benchmarks_baseline.json
+    python benchmarks.py run --runs 5 --output current.json
+    python benchmarks.py compare benchmarks_baseline.json current.json --threshold 0.15
+
+benchmarks_baseline.json is the median of five full (not --quick) runs of
+every group, committed so there is something to compare against. Single
+runs vary by tens of percent on a busy machine. Timings depend on the
+machine, so re-record it with run --runs 5 --output when the reference
+machine changes.
+
+Each metric records whether higher or lower is better and which group
+produced it. compare flags any metric that got worse by more than the
+threshold (a fraction of the baseline) or that is missing from a group
+the current run included, and exits with status 1 if there are any.
+Quick and full runs use different sizes, so comparing one against the
+other is refused.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+import numpy as np
+
+from framing import FrameBuffer
+from main import PacketOptimizer
+
+def time_per_call(function, repeat=5):
+    """Best seconds per call over repeat runs, each at least 0.2 s long"""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def metric(value, unit, higher_is_better):
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+def bench_packets(quick=False):
+    """Test frame generation, verification and decoding"""
+    optimizer = PacketOptimizer("sim://", verbose=False)
+    sent = optimizer.create_test_packet(63, 1234)
+    echoed = bytes(bytearray(sent))  # Equal but not the same object, like a real echo
+    corrupted = sent[:20] + bytes([sent[20] ^ 0xFF]) + sent[21:]
+    stream = b''.join(optimizer.create_test_packet(63, sequence) for sequence in range(256))
+    repeat = 3 if quick else 5
+
+    def decode():
+        buffer = FrameBuffer()
+        buffer.write(stream)
+        while buffer.next_frame() is not None:
+            pass
+
+    create_s = time_per_call(lambda: optimizer.create_test_packet(63, 1234), repeat)
+    verify_s = time_per_call(lambda: optimizer.verify_packet(sent, echoed), repeat)
+    verify_corrupt_s = time_per_call(lambda: optimizer.verify_packet(sent, corrupted), repeat)
+    decode_s = time_per_call(decode, repeat)
+    return {
+        'packet.create_per_sec': metric(1 / create_s, 'ops/s', True),
+        'packet.verify_match_per_sec': metric(1 / verify_s, 'ops/s', True),
+        'packet.verify_corrupt_per_sec': metric(1 / verify_corrupt_s, 'ops/s', True),
+        'packet.decode_bytes_per_sec': metric(len(stream) / decode_s, 'B/s', True),
+    }
+
+def bench_optimizer(quick=False):
+    """Stop-and-wait and pipelined test loops end to end against the simulator"""
+    # A fast firmware loop so the host side of the round trip dominates
+    optimizer = PacketOptimizer("sim://?loop_period_ms=0.05&rx_buffer=4096&seed=1", verbose=False)
+    num_packets = 64 if quick else 256
+    results = {}
+
+    # The test loops print per-test summaries; keep the benchmark output readable
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if not optimizer.connect():
+            raise RuntimeError("Could not open the simulated device")
+        for window_size in (1, 4):
+            # The simulator runs on the real clock, so keep the best of a few runs
+            runs = []
+            for _ in range(3):
+                start = time.perf_counter()
+                result = optimizer.run_test(63, num_packets, 0, window_size)
+                runs.append((num_packets / (time.perf_counter() - start), result))
+
+            name = 'stop_and_wait' if window_size == 1 else f'window_{window_size}'
+            results[f'optimizer.{name}_packets_per_sec'] = metric(max(rate for rate, _ in runs), 'packets/s', True)
+            results[f'optimizer.{name}_p50_ms'] = metric(min(r['p50_round_trip_ms'] for _, r in runs), 'ms', False)
+            results[f'optimizer.{name}_success_pct'] = metric(min(r['success_rate'] for _, r in runs), '%', True)
+        optimizer.disconnect()
+    return results
+
+def bench_magnets(quick=False):
+    """getFT cost against meshing and gap, and the batched sweep for comparison"""
+    import magpylib as magpy
+    from magpylib_force import getFT
+    import magnet_model
+
+    meshings = [27, 125, 512] if quick else [27, 64, 125, 343, 512, 1000]
+    # The nearest gap where the magnets at 30 degrees do not overlap, and a far one
+    gaps_mm = [3.0, 10.0]
+    results = {}
+
+    source = magnet_model.make_source()
+    for meshing in meshings:
+        for gap_mm in gaps_mm:
+            positions, rotation = magnet_model.target_poses(gap_mm, 30.0)
+            target = magpy.magnet.Cylinder(polarization=(0, 0, magnet_model.MAGNET_POL_T),
+                                           dimension=(magnet_model.CYLINDER_DIAMETER_M, magnet_model.CYLINDER_LENGTH_M),
+                                           position=positions[0], orientation=rotation[0])
+            target.meshing = meshing
+            seconds = time_per_call(lambda: getFT(source, target, anchor=magnet_model.ANCHOR), repeat=3)
+            results[f'magnet.getft_mesh{meshing}_gap{gap_mm:g}mm_ms'] = metric(seconds * 1000, 'ms', False)
+
+    gaps = np.linspace(1, 20, 64 if quick else 256)
+    seconds = time_per_call(lambda: magnet_model.sweep_ft(gaps, 30.0), repeat=3)
+    results['magnet.sweep_ft_per_config_ms'] = metric(seconds * 1000 / len(gaps), 'ms', False)
+    return results
+
+BENCHMARKS = {
+    'packets': bench_packets,
+    'optimizer': bench_optimizer,
+    'magnets': bench_magnets,
+}
+
+def run(names=None, quick=False, runs=1):
+    """Run the selected benchmark groups and return a baseline document
+
+    With runs > 1 every group runs that many times and each metric keeps
+    its median.
+    """
+    names = list(names or BENCHMARKS)
+    metrics = {}
+    for name in names:
+        samples = []
+        for index in range(runs):
+            print(f"Running {name}" + (f" ({index + 1}/{runs})" if runs > 1 else "") + "...", file=sys.stderr)
+            samples.append(BENCHMARKS[name](quick))
+        for metric_name, entry in samples[0].items():
+            entry['value'] = float(np.median([sample[metric_name]['value'] for sample in samples]))
+            entry['group'] = name
+            metrics[metric_name] = entry
+    return {
+        'created': time.time(),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'quick': quick,
+        'runs': runs,
+        'groups': names,
+        'metrics': metrics,
+    }
+
+def print_metrics(document):
+    print(f"{'Metric':<45} {'Value':>14} {'Unit':<10}")
+    print("-" * 70)
+    for name, entry in document['metrics'].items():
+        print(f"{name:<45} {entry['value']:>14.4g} {entry['unit']:<10}")
+
+def compare(baseline, current, threshold=0.2):
+    """Print every metric's change and return the names that regressed past threshold or are missing"""
+    if bool(baseline.get('quick')) != bool(current.get('quick')):
+        modes = ['quick' if document.get('quick') else 'full' for document in (baseline, current)]
+        raise ValueError(f"Cannot compare a {modes[1]} run against a {modes[0]} baseline; "
+                         f"rerun {'with' if baseline.get('quick') else 'without'} --quick")
+
+    regressions = []
+    print(f"{'Metric':<45} {'Baseline':>12} {'Current':>12} {'Change':>9}")
+    print("-" * 82)
+    for name, entry in current['metrics'].items():
+        if name not in baseline['metrics']:
+            print(f"{name:<45} {'-':>12} {entry['value']:>12.4g} {'new':>9}")
+            continue
+
+        before = baseline['metrics'][name]['value']
+        change = (entry['value'] - before) / before if before else 0.0
+        # Positive "worse" means the metric moved in its bad direction
+        worse = -change if entry['higher_is_better'] else change
+        flag = ""
+        if worse > threshold:
+            regressions.append(name)
+            flag = " ⚠️ REGRESSION"
+        print(f"{name:<45} {before:>12.4g} {entry['value']:>12.4g} {change * 100:>+8.1f}%{flag}")
+
+    # Only groups the current run included can be missing metrics (documents without groups ran all of them)
+    groups = current.get('groups', list(BENCHMARKS))
+    for name, entry in baseline['metrics'].items():
+        if name not in current['metrics'] and entry.get('group') in groups:
+            regressions.append(name)
+            print(f"{name:<45} {entry['value']:>12.4g} {'-':>12} {'missing':>9} ⚠️ REGRESSION")
+
+    if baseline.get('machine') != current.get('machine'):
+        print(f"\nNote: baseline was recorded on a different machine ({baseline.get('machine')})")
+    print(f"\n{len(regressions)} regression(s) beyond {threshold * 100:.0f}% or missing")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the serial and magnet code paths")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Run benchmarks")
+    run_parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="Benchmark groups to run (default: all)")
+    run_parser.add_argument('--quick', action='store_true', help="Fewer sizes and repetitions")
+    run_parser.add_argument('--runs', type=int, default=1, help="Run each group this many times and keep the medians")
+    run_parser.add_argument('--output', help="Save the results as a JSON baseline")
+    run_parser.add_argument('--compare', metavar='BASELINE', help="Compare against a saved baseline")
+    run_parser.add_argument('--threshold', type=float, default=0.2, help="Regression threshold as a fraction (default: 0.2)")
+
+    compare_parser = subparsers.add_parser('compare', help="Compare two saved results")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.2, help="Regression threshold as a fraction (default: 0.2)")
+    args = parser.parse_args()
+
+    baseline = None
+    baseline_path = args.compare if args.command == 'run' else args.baseline
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+    # Refuse a mode mismatch before spending minutes on the run
+    if args.command == 'run' and baseline is not None and bool(baseline.get('quick')) != args.quick:
+        parser.error(f"{baseline_path} is a {'quick' if baseline.get('quick') else 'full'} baseline; "
+                     f"rerun {'with' if baseline.get('quick') else 'without'} --quick")
+
+    if args.command == 'run':
+        current = run(args.only, args.quick, args.runs)
+        print_metrics(current)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(current, f, indent=2)
+            print(f"\nSaved {args.output}")
+    else:
+        with open(args.current) as f:
+            current = json.load(f)
+
+    if baseline is not None:
+        print()
+        try:
+            regressions = compare(baseline, current, args.threshold)
+        except ValueError as e:
+            parser.error(str(e))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
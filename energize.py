@@ -0,0 +1,182 @@
+"""Choose which face magnets of a tile to energize for a target force/torque
+
+Force and torque are linear in each magnet's polarization. So with the
+neighbouring tiles' magnets fixed, the net force and torque on one tile
+is S @ C: S holds the tile's 12 face states (-1 reversed, 0 off, +1
+outward) and C is the (12, 6) matrix of each face magnet's contribution
+at +1.
+
+The geometry is magnet_tiling's: one magnet per dodecagon face, its axis
+along the outward face normal (magnet_tiling.magnet_poses), not either
+two-magnet script's layout. EnergizationPlanner caches the unit
+contribution of every (face magnet, neighbouring magnet) pair per tile,
+from magnet_tiling's pair model. It rebuilds C from the neighbours'
+current states with one weighted sum.
+
+plan_assignment scores all 3^12 face assignments as a few matrix
+products, cheapest power level first. It stops at the first level that
+has any feasible assignment and returns the closest feasible one of
+that level, so the answer is the minimum-power one.
+"""
+import argparse
+import functools
+import time
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+import magnet_model
+import magnet_tiling
+
+FACES = magnet_tiling.FACES
+
+@functools.lru_cache(maxsize=1)
+def assignments_by_power():
+    """Every face assignment grouped by energized magnet count (0..12)
+
+    float32 so the products in plan() stay in single precision, several
+    times faster than mixing int8 with float64.
+    """
+    codes = np.arange(3 ** FACES)
+    digits = (codes[:, None] // 3 ** np.arange(FACES)) % 3
+    states = (digits - 1).astype(np.float32)
+    energized = np.count_nonzero(states, axis=1)
+    return [states[energized == count] for count in range(FACES + 1)]
+
+class EnergizationPlanner:
+    """Minimum-power face magnet assignments for tiles of a fixed tiling"""
+
+    def __init__(self, centers, states, side_m, face_gap_mm=1.0, cutoff_m=0.2, dipole_tolerance=0.05,
+                 coil_power_w=1.0, **magnet_kwargs):
+        self.centers = np.asarray(centers, dtype=float)
+        self.states = np.array(states, dtype=np.int8).reshape(len(self.centers), FACES)
+        self.cutoff_m = cutoff_m
+        self.dipole_tolerance = dipole_tolerance
+        self.coil_power_w = coil_power_w  # Draw of one energized face magnet, either polarity
+        self.magnet_kwargs = magnet_kwargs
+
+        length_m = magnet_kwargs.get('length_m', magnet_model.CYLINDER_LENGTH_M)
+        self.positions, self.rotation = magnet_tiling.magnet_poses(self.centers, side_m, face_gap_mm, length_m)
+        self._tree = cKDTree(self.positions)
+        self._pair_cache = {}  # tile -> (neighbour magnet indices, faces, (n_pairs, 6) unit contributions)
+
+    def _unit_pairs(self, tile):
+        """Unit (+1, +1) contribution of every face/neighbour pair acting on tile, cached"""
+        if tile not in self._pair_cache:
+            faces = np.arange(tile * FACES, (tile + 1) * FACES)
+            # Neighbours of every state are kept so the cache survives state changes
+            neighbours = self._tree.query_ball_point(self.positions[faces], self.cutoff_m)
+            targets = np.concatenate([np.full(len(found), face) for face, found in zip(faces, neighbours)])
+            sources = np.concatenate([np.asarray(found, dtype=np.intp) for found in neighbours])
+            other_tile = sources // FACES != tile
+            sources, targets = sources[other_tile], targets[other_tile]
+
+            ft, _ = magnet_tiling.pair_ft(self.positions, self.rotation, sources, targets,
+                                          self.dipole_tolerance, **self.magnet_kwargs)
+            # Torque about the source centre -> about this tile's centre
+            torque = ft[:, 1] + np.cross(self.positions[sources] - self.centers[tile], ft[:, 0])
+            self._pair_cache[tile] = (sources, targets - tile * FACES, np.hstack((ft[:, 0], torque)))
+        return self._pair_cache[tile]
+
+    def contributions(self, tile):
+        """(12, 6) force and torque on tile from each of its face magnets at +1, given the neighbours' states"""
+        sources, faces, unit = self._unit_pairs(tile)
+        weighted = unit * self.states.reshape(-1)[sources, None]
+        contributions = np.zeros((FACES, 6))
+        np.add.at(contributions, faces, weighted)
+        return contributions
+
+    def set_states(self, tile, face_states):
+        """Update one tile's face states (cached pair contributions stay valid)"""
+        self.states[tile] = face_states
+
+    def plan(self, tile, target_force, target_torque, force_tolerance=0.5, torque_tolerance=0.005):
+        """Minimum-power face states for tile; see plan_assignment"""
+        return plan_assignment(self.contributions(tile), target_force, target_torque, force_tolerance,
+                               torque_tolerance, self.coil_power_w)
+
+def plan_assignment(contributions, target_force, target_torque, force_tolerance=0.5, torque_tolerance=0.005,
+                    coil_power_w=1.0):
+    """Minimum-power face states whose net force and torque are within tolerance of the target
+
+    contributions is the (12, 6) matrix C. Among feasible assignments of
+    equal power the one closest to the target wins. If nothing is within
+    tolerance, the closest assignment overall is returned with feasible
+    set to False.
+    """
+    contributions = np.asarray(contributions, dtype=float)
+    target_force = np.asarray(target_force, dtype=float)
+    target_torque = np.asarray(target_torque, dtype=float)
+    target = np.concatenate((target_force, target_torque)).astype(np.float32)
+    # Scaling by the tolerances turns both checks into "squared error <= 1"
+    scale = np.repeat([1 / force_tolerance, 1 / torque_tolerance], 3).astype(np.float32)
+
+    closest = None  # (score, states) of the closest assignment so far, used if none is feasible
+    for level in assignments_by_power():
+        error = (level @ contributions.astype(np.float32) - target) * scale
+        error *= error
+        force_error = error[:, :3].sum(axis=1)
+        torque_error = error[:, 3:].sum(axis=1)
+        score = force_error + torque_error
+
+        feasible = (force_error <= 1) & (torque_error <= 1)
+        if np.any(feasible):
+            # The closest assignment of a level need not be feasible, so search only the feasible ones
+            index = int(np.argmin(np.where(feasible, score, np.inf)))
+            return _plan_result(level[index], contributions, target_force, target_torque, coil_power_w, True)
+
+        index = int(np.argmin(score))
+        if closest is None or score[index] < closest[0]:
+            closest = (score[index], level[index])
+    return _plan_result(closest[1], contributions, target_force, target_torque, coil_power_w, False)
+
+def _plan_result(states, contributions, target_force, target_torque, coil_power_w, feasible):
+    result = states @ contributions
+    return {
+        'states': states.astype(np.int8),
+        'force': result[:3],
+        'torque': result[3:],
+        'power_w': np.count_nonzero(states) * coil_power_w,
+        'feasible': feasible,
+        'force_error': np.linalg.norm(result[:3] - target_force),
+        'torque_error': np.linalg.norm(result[3:] - target_torque),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick the minimum-power face magnet states for a target force/torque")
+    parser.add_argument('--rows', type=int, default=5)
+    parser.add_argument('--cols', type=int, default=5)
+    parser.add_argument('--side', type=float, default=0.03, help="Dodecagon side length in m (default: 0.03)")
+    parser.add_argument('--tile', type=int, help="Tile to plan for (default: the centre tile)")
+    parser.add_argument('--force', nargs=2, type=float, default=[5.0, 0.0], metavar=('FX', 'FY'),
+                        help="Target in-plane force in N (default: 5 0)")
+    parser.add_argument('--torque', type=float, default=0.0, help="Target torque about the tile centre (Tz) in N*m")
+    parser.add_argument('--force-tolerance', type=float, default=0.5, help="In N (default: 0.5)")
+    parser.add_argument('--torque-tolerance', type=float, default=0.005, help="In N*m (default: 0.005)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the neighbours' random face states")
+    args = parser.parse_args()
+
+    centers = magnet_tiling.tile_centers(args.rows, args.cols, args.side)
+    states = np.random.default_rng(args.seed).integers(-1, 2, size=(len(centers), FACES))
+    tile = args.tile if args.tile is not None else (args.rows // 2) * args.cols + args.cols // 2
+
+    planner = EnergizationPlanner(centers, states, args.side)
+    start = time.perf_counter()
+    planner.contributions(tile)
+    assignments_by_power()
+    setup_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plan = planner.plan(tile, (args.force[0], args.force[1], 0.0), (0.0, 0.0, args.torque),
+                        args.force_tolerance, args.torque_tolerance)
+    plan_s = time.perf_counter() - start
+
+    print(f"Tile {tile}: {'feasible' if plan['feasible'] else 'NOT feasible, closest'} assignment "
+          f"with {plan['power_w']:.1f} W")
+    print(f"  Face states: {' '.join(f'{state:+d}' if state else ' 0' for state in plan['states'])}")
+    print(f"  Force (Fx, Fy): ({plan['force'][0]:.3f}, {plan['force'][1]:.3f}) N, error {plan['force_error']:.3f} N")
+    print(f"  Torque (Tz): {plan['torque'][2]:.5f} N*m, error {plan['torque_error']:.5f} N*m")
+    print(f"  Setup (pair contributions, assignment table): {setup_s * 1000:.1f}ms, plan: {plan_s * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Turn the table's encoder and button output into typed, timestamped events
+
+The firmware reports input as text lines:
+    Encoder #2 -> 17     (updateSeesawInputs, encoder moved)
+    ENC0 pressed!        (updateSeesawInputs, encoder button pressed)
+    Button: 3            (main loop, effect button)
+
+EventReader parses these on a background thread as soon as the bytes
+arrive and hands the events to the consumer through EventRing, a
+single-producer/single-consumer ring buffer that needs no lock. Consumers
+either poll() or use `async for event in reader.events()`.
+
+Event timestamps are the host perf_counter_ns at which the line's last
+byte was read, since the firmware does not timestamp its output.
+"""
+import argparse
+import asyncio
+import collections
+import re
+import time
+
+from histogram import LatencyHistogram
+from main import SerialReader, open_connection
+
+EncoderEvent = collections.namedtuple('EncoderEvent', ['encoder', 'position', 'timestamp_ns'])
+PressEvent = collections.namedtuple('PressEvent', ['encoder', 'timestamp_ns'])
+ButtonEvent = collections.namedtuple('ButtonEvent', ['button', 'timestamp_ns'])
+TextEvent = collections.namedtuple('TextEvent', ['text', 'timestamp_ns'])  # Any other line
+
+_LINE = re.compile(rb'Encoder #(\d+) -> (-?\d+)|ENC(\d+) pressed!|Button: (\d+)')
+
+BAUD_RATE = 2000000
+
+def parse_line(line, timestamp_ns):
+    """Event for one line of firmware output (without the line ending)"""
+    match = _LINE.fullmatch(line)
+    if match is None:
+        return TextEvent(line.decode('ascii', 'replace'), timestamp_ns)
+
+    encoder, position, pressed, button = match.groups()
+    if encoder is not None:
+        return EncoderEvent(int(encoder), int(position), timestamp_ns)
+    if pressed is not None:
+        return PressEvent(int(pressed), timestamp_ns)
+    return ButtonEvent(int(button), timestamp_ns)
+
+class LineParser:
+    """Incremental parser that splits a byte stream into line events"""
+
+    def __init__(self, max_line=256):
+        self.max_line = max_line
+        self._pending = b''
+        self.line_count = 0
+        self.byte_count = 0
+        self.overlong_count = 0  # Lines dropped for exceeding max_line (binary noise)
+
+    def feed(self, data, timestamp_ns):
+        """Parse every complete line in data and return their events"""
+        self.byte_count += len(data)
+        lines = (self._pending + data).split(b'\n')
+        self._pending = lines.pop()
+        if len(self._pending) > self.max_line:
+            self._pending = b''
+            self.overlong_count += 1
+
+        events = []
+        for line in lines:
+            line = line.rstrip(b'\r')
+            if line:
+                events.append(parse_line(line, timestamp_ns))
+        self.line_count += len(events)
+        return events
+
+class EventRing:
+    """Fixed-size single-producer/single-consumer ring buffer
+
+    Only the producer advances _tail and only the consumer advances _head,
+    and each is a single reference assignment, so the two sides never need
+    a lock. When the ring is full new events are dropped and counted.
+    """
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._head = 0  # Next slot to read (consumer owned)
+        self._tail = 0  # Next slot to write (producer owned)
+        self.dropped_count = 0
+
+    def __len__(self):
+        return self._tail - self._head
+
+    def push(self, item):
+        """Producer side: add item, returning False if the ring is full"""
+        tail = self._tail
+        if tail - self._head >= self.capacity:
+            self.dropped_count += 1
+            return False
+        self._slots[tail % self.capacity] = item
+        self._tail = tail + 1  # Publish only after the slot is written
+        return True
+
+    def pop_all(self):
+        """Consumer side: remove and return everything currently in the ring"""
+        head, tail = self._head, self._tail
+        items = [self._slots[index % self.capacity] for index in range(head, tail)]
+        self._head = tail
+        return items
+
+class EventReader(SerialReader):
+    """Background reader that parses firmware output into an EventRing"""
+
+    def __init__(self, connection, capacity=4096):
+        super().__init__(connection)
+        self.parser = LineParser()
+        self.ring = EventRing(capacity)
+        self.latency_histogram = LatencyHistogram()  # Byte arrival -> consumer, in ns
+        self.parse_time_ns = 0
+
+        self._loop = None
+        self._wakeup = None
+
+    def _handle(self, arrival_ns, data):
+        events = self.parser.feed(data, arrival_ns)
+        self.parse_time_ns += time.perf_counter_ns() - arrival_ns
+
+        for event in events:
+            self.ring.push(event)
+        if not events:
+            return
+
+        # events() assigns _wakeup before _loop, so reading _loop first sees a matching pair
+        loop = self._loop
+        wakeup = self._wakeup
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            # The consumer's event loop has closed: nobody is left to wake, so stop reading
+            self._stop_event.set()
+
+    def poll(self):
+        """Return every event received since the last poll"""
+        events = self.ring.pop_all()
+        now_ns = time.perf_counter_ns()
+        for event in events:
+            self.latency_histogram.record(now_ns - event.timestamp_ns)
+        return events
+
+    async def events(self):
+        """Async iterator over events as they arrive"""
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        try:
+            while True:
+                for event in self.poll():
+                    yield event
+                self._wakeup.clear()
+                # Events pushed between the poll and the clear have already signalled
+                if len(self.ring) == 0:
+                    await self._wakeup.wait()
+        finally:
+            self._loop = None
+
+    def stats(self):
+        """Parse throughput and delivery latency so far"""
+        parse_time_s = self.parse_time_ns / 1e9
+        return {
+            'lines': self.parser.line_count,
+            'bytes': self.parser.byte_count,
+            'overlong_lines': self.parser.overlong_count,
+            'dropped_events': self.ring.dropped_count,
+            'parse_lines_per_sec': self.parser.line_count / parse_time_s if parse_time_s > 0 else 0,
+            'parse_bytes_per_sec': self.parser.byte_count / parse_time_s if parse_time_s > 0 else 0,
+            'p50_latency_ms': self.latency_histogram.percentile(50) / 1e6,
+            'p99_latency_ms': self.latency_histogram.percentile(99) / 1e6,
+            'max_latency_ms': (self.latency_histogram.max_ns or 0) / 1e6,
+        }
+
+def print_stats(stats):
+    print(f"\n{'='*100}")
+    print("EVENT INGESTION")
+    print(f"{'='*100}")
+    print(f"Lines parsed: {stats['lines']} ({stats['bytes']} bytes, {stats['overlong_lines']} overlong, "
+          f"{stats['dropped_events']} dropped)")
+    print(f"Parse throughput: {stats['parse_lines_per_sec']:,.0f} lines/sec, {stats['parse_bytes_per_sec']:,.0f} bytes/sec")
+    print(f"Delivery latency: p50 {stats['p50_latency_ms']:.3f}ms, p99 {stats['p99_latency_ms']:.3f}ms, "
+          f"max {stats['max_latency_ms']:.3f}ms")
+
+async def watch(reader, duration_s):
+    """Print events until duration_s elapses"""
+    async def consume():
+        async for event in reader.events():
+            print(event)
+
+    try:
+        await asyncio.wait_for(consume(), duration_s)
+    except asyncio.TimeoutError:
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Print encoder and button events from the table")
+    parser.add_argument('--port', required=True, help="Serial port, or sim://?... for the simulated device")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds to listen")
+    parser.add_argument('--burst', type=int, default=0,
+                        help="Send this many synthetic event lines first (the echo firmware sends them back)")
+    args = parser.parse_args()
+
+    connection = open_connection(args.port, BAUD_RATE)
+    reader = EventReader(connection)
+    reader.start()
+    try:
+        if args.burst:
+            lines = [b'Encoder #%d -> %d\r\n' % (i % 4, i) if i % 3 else b'ENC%d pressed!\r\n' % (i % 4) for i in range(args.burst)]
+            connection.write(b''.join(lines))
+        asyncio.run(watch(reader, args.duration))
+
+    except KeyboardInterrupt:
+        print("\nStopped by user")
+
+    finally:
+        reader.stop()
+        connection.close()
+
+    print_stats(reader.stats())
+
+if __name__ == "__main__":
+    main()
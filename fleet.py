@@ -0,0 +1,153 @@
+"""Run the packet optimizer on every connected table at once
+
+Each port gets its own PacketOptimizer running in a worker thread, and
+asyncio waits on all of them together, so qualifying a fleet takes about
+as long as qualifying its slowest table. The threads come from a pool
+sized to the fleet: asyncio's default executor is capped at
+cpu_count + 4 threads, which would run a large fleet in waves.
+Cancelling (Ctrl-C) sets each optimizer's stop event, so the worker
+threads stop sending too.
+"""
+import argparse
+import asyncio
+import functools
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from histogram import LatencyHistogram
+from main import PacketOptimizer, find_arduinos
+
+async def optimize_port(port, window_size=1, executor=None):
+    """Run the full size/delay sweep on one port, in a thread from executor (default: asyncio's)"""
+    stop_event = threading.Event()
+    optimizer = PacketOptimizer(port, verbose=False, stop_event=stop_event, log_prefix=f"[{port}] ")
+    run = functools.partial(optimizer.run_optimization, window_size=window_size, print_summary=False)
+    try:
+        results = await asyncio.get_running_loop().run_in_executor(executor, run)
+    except asyncio.CancelledError:
+        # Cancelling the await does not stop the thread; the test loops check this event
+        stop_event.set()
+        raise
+
+    for result in results or []:
+        result['port'] = port
+    return results
+
+async def optimize_fleet(ports, window_size=1):
+    """Sweep every port concurrently and return {port: results}"""
+    executor = ThreadPoolExecutor(max_workers=max(len(ports), 1), thread_name_prefix='fleet')
+    try:
+        outcomes = await asyncio.gather(*(optimize_port(port, window_size, executor) for port in ports),
+                                        return_exceptions=True)
+    finally:
+        # Cancelled workers finish on their own once they see their stop event; don't block the loop on them
+        executor.shutdown(wait=False)
+
+    fleet_results = {}
+    for port, outcome in zip(ports, outcomes):
+        if isinstance(outcome, BaseException):
+            print(f"Error optimizing {port}: {outcome}")
+            outcome = None
+        fleet_results[port] = outcome
+    return fleet_results
+
+def merge_fleet_results(fleet_results):
+    """Combine per-port results into one row per (size, delay, window) setting"""
+    settings = {}
+    for port, results in fleet_results.items():
+        for result in results or []:
+            key = (result['packet_size'], result['delay_ms'], result.get('window_size', 1))
+            settings.setdefault(key, []).append(result)
+
+    merged = []
+    for (packet_size, delay_ms, window_size), group in settings.items():
+        histogram = LatencyHistogram()
+        for result in group:
+            histogram.merge(result['latency_histogram'])
+
+        merged.append({
+            'packet_size': packet_size,
+            'delay_ms': delay_ms,
+            'window_size': window_size,
+            'ports': sorted(result['port'] for result in group),
+            'worst_success_rate': min(result['success_rate'] for result in group),
+            'mean_success_rate': statistics.mean(result['success_rate'] for result in group),
+            'worst_throughput_bps': min(result['effective_throughput_bps'] for result in group),
+            'mean_round_trip_ms': statistics.mean(result['avg_round_trip_ms'] for result in group),
+            'worst_round_trip_ms': max(result['avg_round_trip_ms'] for result in group),
+            'latency_histogram': histogram,
+            'p99_round_trip_ms': histogram.percentile(99) / 1e6,
+            'p999_round_trip_ms': histogram.percentile(99.9) / 1e6,
+        })
+    return merged
+
+def print_fleet_summary(fleet_results):
+    """Print per-port summaries followed by settings that work across the fleet"""
+    for port, results in fleet_results.items():
+        print(f"\n{'#'*100}")
+        print(f"PORT {port}")
+        if results is None:
+            print("Optimization failed")
+            continue
+        PacketOptimizer(port).print_optimization_summary(results)
+
+    merged = merge_fleet_results(fleet_results)
+    tested_ports = [port for port, results in fleet_results.items() if results]
+
+    print(f"\n{'='*100}")
+    print(f"FLEET SUMMARY ({len(tested_ports)}/{len(fleet_results)} ports tested)")
+    print(f"{'='*100}")
+
+    if not merged:
+        print("No successful tests!")
+        return
+
+    print(f"{'Size':<6} {'Delay':<6} {'Ports':<6} {'Worst%':<8} {'Mean%':<8} {'Worst RT(ms)':<13} {'p99(ms)':<10} {'p99.9(ms)':<10} {'Worst B/s':<10}")
+    print("-" * 90)
+    for row in sorted(merged, key=lambda x: (x['delay_ms'], x['packet_size'])):
+        print(f"{row['packet_size']:<6} {row['delay_ms']:<6} {len(row['ports']):<6} {row['worst_success_rate']:>6.1f}% "
+              f"{row['mean_success_rate']:>6.1f}% {row['worst_round_trip_ms']:>12.3f} {row['p99_round_trip_ms']:>9.3f} "
+              f"{row['p999_round_trip_ms']:>10.3f} {row['worst_throughput_bps']:>10.0f}")
+
+    # Only settings every tested table handled reliably are recommended
+    fleet_wide = [row for row in merged if len(row['ports']) == len(tested_ports) and row['worst_success_rate'] >= 95.0]
+
+    print(f"\n{'='*100}")
+    print("FLEET RECOMMENDATIONS:")
+    if not fleet_wide:
+        print("No setting was reliable on every table")
+        return
+
+    best_reliable = max(fleet_wide, key=lambda x: x['worst_throughput_bps'])
+    print(f"🏆 Best Reliable: {best_reliable['packet_size']} bytes, {best_reliable['delay_ms']}ms delay")
+    print(f"    ({best_reliable['worst_success_rate']:.1f}% worst success, {best_reliable['worst_throughput_bps']:.0f} B/s worst throughput)")
+
+    fastest = min(fleet_wide, key=lambda x: x['worst_round_trip_ms'])
+    print(f"⚡ Lowest Latency: {fastest['packet_size']} bytes, {fastest['delay_ms']}ms delay")
+    print(f"    ({fastest['worst_round_trip_ms']:.3f}ms worst avg, {fastest['p99_round_trip_ms']:.3f}ms fleet p99, {fastest['worst_success_rate']:.1f}% worst success)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimize every connected table concurrently")
+    parser.add_argument('--window', type=int, default=1,
+                        help="Packets in flight per test (1 = stop-and-wait)")
+    parser.add_argument('--port', action='append', dest='ports',
+                        help="Port to test (repeatable, default: every detected Arduino)")
+    args = parser.parse_args()
+
+    ports = args.ports or find_arduinos()
+    if not ports:
+        print("No Arduino ports found!")
+        return
+
+    print(f"Optimizing {len(ports)} tables: {', '.join(ports)}")
+
+    try:
+        fleet_results = asyncio.run(optimize_fleet(ports, window_size=args.window))
+        print_fleet_summary(fleet_results)
+
+    except KeyboardInterrupt:
+        print("\nOptimization stopped by user")
+
+if __name__ == "__main__":
+    main()
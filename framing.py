@@ -0,0 +1,194 @@
+"""Binary test frames for the serial link
+
+Frame layout (little endian):
+    [length:u16][sequence:u32][payload:length bytes][crc32:u32]
+
+The CRC32 covers the length, sequence and payload fields. Frames are
+binary safe, so payloads may contain any byte value.
+"""
+import struct
+import zlib
+
+HEADER = struct.Struct('<HI')
+TRAILER = struct.Struct('<I')
+OVERHEAD = HEADER.size + TRAILER.size
+
+# Payload pattern covering every byte value; frames take a slice of it
+# instead of generating bytes one at a time
+_PATTERN = bytes(range(256)) * 32
+
+
+def payload_size(frame_size):
+    """Payload bytes carried by a frame of frame_size total bytes"""
+    return max(frame_size - OVERHEAD, 1)
+
+
+def encode_frame(sequence, payload):
+    """Build a frame around payload"""
+    frame = bytearray(OVERHEAD + len(payload))
+    HEADER.pack_into(frame, 0, len(payload), sequence & 0xFFFFFFFF)
+    frame[HEADER.size:HEADER.size + len(payload)] = payload
+    crc = zlib.crc32(memoryview(frame)[:HEADER.size + len(payload)])
+    TRAILER.pack_into(frame, HEADER.size + len(payload), crc)
+    return bytes(frame)
+
+
+def make_test_frame(frame_size, sequence):
+    """Build a frame_size byte frame with a predictable payload for sequence"""
+    length = payload_size(frame_size)
+    if length > len(_PATTERN) - 256:
+        raise ValueError(f"Frame size {frame_size} is too large")
+    offset = sequence & 0xFF
+    return encode_frame(sequence, memoryview(_PATTERN)[offset:offset + length])
+
+
+def check_frame(frame):
+    """Return True if frame is complete and its CRC matches"""
+    if len(frame) < OVERHEAD:
+        return False
+    length, _ = HEADER.unpack_from(frame, 0)
+    if len(frame) != OVERHEAD + length:
+        return False
+    (crc,) = TRAILER.unpack_from(frame, HEADER.size + length)
+    return zlib.crc32(memoryview(frame)[:HEADER.size + length]) == crc
+
+
+class FrameBuffer:
+    """Preallocated receive ring buffer that splits a byte stream into frames
+
+    Bytes that cannot start a valid frame (firmware log lines, corrupted
+    data) are skipped one at a time until the stream resynchronises.
+    """
+
+    def __init__(self, capacity=65536, max_payload=256):
+        self.capacity = capacity
+        self.max_payload = max_payload
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._size = 0
+        self.skipped_bytes = 0
+
+    def __len__(self):
+        return self._size
+
+    def clear(self):
+        """Discard all buffered data"""
+        self._start = 0
+        self._size = 0
+
+    def write(self, data):
+        """Append received bytes to the buffer"""
+        data = memoryview(data)
+        count = len(data)
+        if count > self.capacity - self._size:
+            raise BufferError(f"Receive buffer overflow ({self._size + count} > {self.capacity} bytes)")
+
+        end = (self._start + self._size) % self.capacity
+        first = min(count, self.capacity - end)
+        self._view[end:end + first] = data[:first]
+        if first < count:
+            self._view[:count - first] = data[first:]
+        self._size += count
+
+    def _segments(self, offset, count):
+        """Views over count buffered bytes starting at offset (one or two pieces)"""
+        start = (self._start + offset) % self.capacity
+        first = min(count, self.capacity - start)
+        if first == count:
+            return (self._view[start:start + count],)
+        return (self._view[start:], self._view[:count - first])
+
+    def _read(self, offset, count):
+        segments = self._segments(offset, count)
+        if len(segments) == 1:
+            return segments[0]
+        return b''.join(segments)
+
+    def _consume(self, count):
+        self._start = (self._start + count) % self.capacity
+        self._size -= count
+        if self._size == 0:
+            self._start = 0
+
+    def _crc_ok(self, offset, length):
+        """True if the length byte frame buffered at offset has a matching CRC"""
+        crc = 0
+        for segment in self._segments(offset, HEADER.size + length):
+            crc = zlib.crc32(segment, crc)
+        (expected_crc,) = TRAILER.unpack_from(self._read(offset + HEADER.size + length, TRAILER.size), 0)
+        return crc == expected_crc
+
+    def _expected_header(self, offset, is_expected):
+        """(sequence, length) of a plausible expected header at offset, or None"""
+        length, sequence = HEADER.unpack_from(self._read(offset, HEADER.size), 0)
+        if length <= self.max_payload and is_expected(sequence, length):
+            return sequence, length
+        return None
+
+    def _corrupt_frame_size(self, frame_size, is_expected, more_expected):
+        """Bytes that belong to an expected frame whose CRC failed, or None to wait for more data
+
+        A corrupted byte leaves the next frame's header right after the
+        frame. A lost byte makes the claimed span run into the next frame,
+        so the frame is cut short where a valid frame starts inside it.
+        When the buffer ends right after the frame the two cannot be told
+        apart; if more_expected, wait for the next frame to decide.
+        """
+        following = self._size - frame_size
+        if following >= HEADER.size and self._expected_header(frame_size, is_expected):
+            return frame_size
+
+        for offset in range(1, min(frame_size, self._size - HEADER.size + 1)):
+            header = self._expected_header(offset, is_expected)
+            if header is None:
+                continue
+            if offset + OVERHEAD + header[1] > self._size:
+                return None
+            if self._crc_ok(offset, header[1]):
+                return offset
+
+        # Part of the next header has arrived (or will); wait to see where it starts
+        if 0 < following < HEADER.size or (following == 0 and more_expected):
+            return None
+        return frame_size
+
+    def next_frame(self, is_expected=None, more_expected=False):
+        """Return the next (sequence, frame, crc_ok) in the buffer, or None
+
+        A frame whose CRC fails is normally treated as noise. If is_expected
+        is given and is_expected(sequence, length) is true for its header,
+        the frame is returned with crc_ok False instead so the caller can
+        count it as corrupted. If bytes were lost, so that a valid frame
+        starts inside the claimed span, the frame is cut short there and
+        comes back shorter than its header says. more_expected tells it
+        whether more frames are still due after this one.
+        """
+        while self._size >= HEADER.size:
+            length, sequence = HEADER.unpack_from(self._read(0, HEADER.size), 0)
+            if length > self.max_payload:
+                self._consume(1)
+                self.skipped_bytes += 1
+                continue
+
+            frame_size = OVERHEAD + length
+            if self._size < frame_size:
+                return None
+
+            if self._crc_ok(0, length):
+                frame = bytes(self._read(0, frame_size))
+                self._consume(frame_size)
+                return sequence, frame, True
+
+            if is_expected is not None and is_expected(sequence, length):
+                frame_size = self._corrupt_frame_size(frame_size, is_expected, more_expected)
+                if frame_size is None:
+                    return None
+                frame = bytes(self._read(0, frame_size))
+                self._consume(frame_size)
+                return sequence, frame, False
+
+            self._consume(1)
+            self.skipped_bytes += 1
+
+        return None
@@ -0,0 +1,129 @@
+"""Fixed-memory latency histogram with log-bucketed percentiles
+
+Values are integer nanoseconds. Values below 2**precision_bits get a
+bucket each; above that every power of two is split into
+2**(precision_bits - 1) linear sub-buckets (the HDR histogram layout), so
+any recorded value is reported to within 1 part in 2**(precision_bits - 1).
+Memory depends only on precision_bits and max_value_ns, never on how many
+values were recorded.
+"""
+import math
+
+
+class LatencyHistogram:
+    """Streaming histogram of latencies in nanoseconds"""
+
+    def __init__(self, precision_bits=8, max_value_ns=3_600_000_000_000):
+        self.precision_bits = precision_bits
+        self.max_value_ns = max_value_ns
+        self._sub_bucket_count = 1 << precision_bits
+        self._half_count = self._sub_bucket_count >> 1
+        self.counts = [0] * (self._index(max_value_ns) + 1)
+
+        self.count = 0
+        self.overflow_count = 0  # Values clamped to max_value_ns
+        self.total_ns = 0
+        self._sum_squares = 0
+        self.min_ns = None
+        self.max_ns = None
+
+    def _index(self, value):
+        if value < self._sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.precision_bits
+        return self._sub_bucket_count + (shift - 1) * self._half_count + ((value >> shift) - self._half_count)
+
+    def _bucket_range(self, index):
+        """Lowest value and width of the bucket at index"""
+        if index < self._sub_bucket_count:
+            return index, 1
+        shift = (index - self._sub_bucket_count) // self._half_count + 1
+        mantissa = (index - self._sub_bucket_count) % self._half_count + self._half_count
+        return mantissa << shift, 1 << shift
+
+    def record(self, value_ns, count=1):
+        """Record a latency value count times"""
+        value_ns = max(int(value_ns), 0)
+        if value_ns > self.max_value_ns:
+            self.overflow_count += count
+            value_ns = self.max_value_ns
+
+        self.counts[self._index(value_ns)] += count
+        self.count += count
+        self.total_ns += value_ns * count
+        self._sum_squares += value_ns * value_ns * count
+        if self.min_ns is None or value_ns < self.min_ns:
+            self.min_ns = value_ns
+        if self.max_ns is None or value_ns > self.max_ns:
+            self.max_ns = value_ns
+
+    def merge(self, other):
+        """Add every value recorded by other into this histogram"""
+        if (other.precision_bits, other.max_value_ns) != (self.precision_bits, self.max_value_ns):
+            raise ValueError("Cannot merge histograms with different layouts")
+
+        for index, bucket_count in enumerate(other.counts):
+            if bucket_count:
+                self.counts[index] += bucket_count
+        self.count += other.count
+        self.overflow_count += other.overflow_count
+        self.total_ns += other.total_ns
+        self._sum_squares += other._sum_squares
+        if other.min_ns is not None and (self.min_ns is None or other.min_ns < self.min_ns):
+            self.min_ns = other.min_ns
+        if other.max_ns is not None and (self.max_ns is None or other.max_ns > self.max_ns):
+            self.max_ns = other.max_ns
+        return self
+
+    def percentile(self, percent):
+        """Value at or below which percent of the recorded values fall"""
+        if self.count == 0:
+            return 0
+
+        rank = max(math.ceil(self.count * percent / 100.0), 1)
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                low, width = self._bucket_range(index)
+                # Report the middle of the bucket, kept inside the observed range
+                return min(max(low + (width - 1) // 2, self.min_ns), self.max_ns)
+        return self.max_ns
+
+    def mean(self):
+        return self.total_ns / self.count if self.count else 0
+
+    def stdev(self):
+        """Sample standard deviation"""
+        if self.count < 2:
+            return 0
+        # Both sums are exact ints, so form the numerator exactly before the one division
+        spread = self.count * self._sum_squares - self.total_ns * self.total_ns
+        return math.sqrt(spread / (self.count * (self.count - 1)))
+
+    def to_dict(self):
+        """Sparse, JSON friendly representation"""
+        return {
+            'precision_bits': self.precision_bits,
+            'max_value_ns': self.max_value_ns,
+            'count': self.count,
+            'overflow_count': self.overflow_count,
+            'total_ns': self.total_ns,
+            'sum_squares': self._sum_squares,
+            'min_ns': self.min_ns,
+            'max_ns': self.max_ns,
+            'buckets': {index: bucket_count for index, bucket_count in enumerate(self.counts) if bucket_count},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data['precision_bits'], data['max_value_ns'])
+        for index, bucket_count in data['buckets'].items():
+            histogram.counts[int(index)] = bucket_count
+        histogram.count = data['count']
+        histogram.overflow_count = data['overflow_count']
+        histogram.total_ns = data['total_ns']
+        histogram._sum_squares = data['sum_squares']
+        histogram.min_ns = data['min_ns']
+        histogram.max_ns = data['max_ns']
+        return histogram
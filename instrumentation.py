@@ -0,0 +1,121 @@
+"""Where the time in a packet test goes, and a JSONL sink for results
+
+Instrumentation keeps a LatencyHistogram per hot-path stage plus plain
+counters. The test loops mark stage boundaries with lap(). Inside a
+timed round trip they only collect raw (stage, perf_counter_ns) stamps
+and replay() them once the round trip is over, so the histogram updates
+never land in the latency being measured.
+"""
+import collections
+import json
+import time
+
+from histogram import LatencyHistogram
+
+# Stages timed by the packet test loops, in the order they happen
+STAGES = ['create', 'write', 'flush', 'wait', 'read', 'decode', 'verify', 'report', 'delay']
+
+class Instrumentation:
+    """Per-stage timers and event counters for one test"""
+
+    def __init__(self):
+        self.timers = {stage: LatencyHistogram() for stage in STAGES}
+        self.counters = collections.Counter()
+
+    def lap(self, stage, start_ns):
+        """Charge the time since start_ns to stage and return the current time"""
+        now_ns = time.perf_counter_ns()
+        self.timers[stage].record(now_ns - start_ns)
+        return now_ns
+
+    def replay(self, start_ns, stamps):
+        """Charge each (stage, stamp_ns) the time since the previous stamp and return the last stamp"""
+        for stage, stamp_ns in stamps:
+            self.timers[stage].record(stamp_ns - start_ns)
+            start_ns = stamp_ns
+        return start_ns
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def merge(self, other):
+        """Add every timing and count from other into this instance"""
+        for stage, histogram in other.timers.items():
+            self.timers.setdefault(stage, LatencyHistogram()).merge(histogram)
+        self.counters.update(other.counters)
+        return self
+
+    def summary(self):
+        """Total, mean and p99 per stage in milliseconds/microseconds"""
+        return {
+            stage: {
+                'calls': histogram.count,
+                'total_ms': histogram.total_ns / 1e6,
+                'mean_us': histogram.mean() / 1e3,
+                'p99_us': histogram.percentile(99) / 1e3,
+            }
+            for stage, histogram in self.timers.items() if histogram.count
+        }
+
+    def to_dict(self):
+        return {
+            'stages': self.summary(),
+            'counters': dict(self.counters),
+        }
+
+    def print_breakdown(self):
+        """Print where the measured time went, largest stage first"""
+        summary = self.summary()
+        total_ms = sum(stage['total_ms'] for stage in summary.values())
+        print(f"    {'Stage':<8} {'Calls':<7} {'Total(ms)':<10} {'Share':<7} {'Mean(us)':<9} {'p99(us)':<9}")
+        for stage, stats in sorted(summary.items(), key=lambda item: item[1]['total_ms'], reverse=True):
+            share = stats['total_ms'] / total_ms * 100 if total_ms > 0 else 0
+            print(f"    {stage:<8} {stats['calls']:<7} {stats['total_ms']:>9.2f} {share:>5.1f}% {stats['mean_us']:>9.1f} {stats['p99_us']:>9.1f}")
+
+class ProgressReporter:
+    """Print one aggregated line every interval_s instead of a line per packet"""
+
+    def __init__(self, num_packets, interval_s=1.0):
+        self.num_packets = num_packets
+        self.interval_ns = int(interval_s * 1e9)
+        self._next_ns = time.perf_counter_ns() + self.interval_ns
+
+    def update(self, results, done, force=False):
+        now_ns = time.perf_counter_ns()
+        if not force and now_ns < self._next_ns:
+            return
+        self._next_ns = now_ns + self.interval_ns
+
+        histogram = results['latency_histogram']
+        print(f"  [{done:>4}/{self.num_packets}] ✓{results['success_count']} T{results['timeout_count']} "
+              f"P{results['partial_count']} C{results['corruption_count']}, "
+              f"p50 {histogram.percentile(50) / 1e6:.3f}ms, p99 {histogram.percentile(99) / 1e6:.3f}ms")
+
+def _jsonable(value):
+    if isinstance(value, (LatencyHistogram, Instrumentation)):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, collections.deque)):
+        return [_jsonable(item) for item in value]
+    return value
+
+class JsonlSink:
+    """Append one JSON object per test result to a file"""
+
+    # Per-batch detail that would dwarf the rest of the record
+    EXCLUDED_KEYS = {'batch_throughputs'}
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record, **extra):
+        record = {key: value for key, value in record.items() if key not in self.EXCLUDED_KEYS}
+        record.update(extra)
+        record.setdefault('timestamp', time.time())
+        self._file.write(json.dumps(_jsonable(record)) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,319 @@
+"""Render LED patterns on the host and stream them as compressed frame updates
+
+The patterns from led_patterns.cpp are computed here as NumPy arrays of
+shape (NUMBER_OF_LEDS, 3). Each frame is sent as a delta against the
+previous one, run-length encoded and split into update messages that fit
+the 64-byte chunk the firmware reads per loop.
+
+Update messages use the binary frame format from framing.py with the
+frame number as the sequence. The payload is:
+    [start_led:u8] op op op ...
+where each op starts with a byte holding the op type in the top two bits
+and count - 1 (1..64 LEDs) in the low six bits:
+    SKIP    leave the next count LEDs unchanged
+    RUN     set the next count LEDs to the one RGB triple that follows
+    LITERAL set the next count LEDs to the count RGB triples that follow
+Every message starts at an absolute LED index, so a lost message only
+affects the LEDs it covers until the next keyframe.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from framing import OVERHEAD, encode_frame
+from main import open_connection
+
+# LEDWriter::numberOfLogicalLEDS (lastValidLED - firstValidLED)
+NUMBER_OF_LEDS = 83 - 5
+
+BAUD_RATE = 2000000
+
+# Largest message the firmware reads in one loop (Array<char, 64>)
+MAX_MESSAGE_SIZE = 64
+MAX_PAYLOAD_SIZE = MAX_MESSAGE_SIZE - OVERHEAD
+
+OP_SKIP = 0
+OP_RUN = 1
+OP_LITERAL = 2
+MAX_OP_COUNT = 64
+
+_INDEX = np.arange(NUMBER_OF_LEDS, dtype=np.float32)
+
+def _u8(values):
+    """Convert like a float -> uint8_t assignment in the firmware"""
+    return np.clip(values, 0, 255).astype(np.uint8)
+
+def _rgb(red, green, blue):
+    frame = np.empty((NUMBER_OF_LEDS, 3), dtype=np.uint8)
+    frame[:, 0] = red
+    frame[:, 1] = green
+    frame[:, 2] = blue
+    return frame
+
+def _hsv_to_rgb(hue, saturation, value):
+    """Vectorized HSV -> RGB on 0-255 scales (approximates FastLED's CHSV)"""
+    h = hue.astype(np.float32) / 255.0 * 6.0
+    s = saturation / 255.0
+    v = value / 255.0
+    sector = np.floor(h).astype(np.int32) % 6
+    f = h - np.floor(h)
+    p = v * (1 - s)
+    q = v * (1 - s * f)
+    t = v * (1 - s * (1 - f))
+    red = np.choose(sector, [v, q, p, p, t, v])
+    green = np.choose(sector, [t, v, v, q, p, p])
+    blue = np.choose(sector, [p, p, t, v, v, q])
+    return _rgb(_u8(red * 255), _u8(green * 255), _u8(blue * 255))
+
+def dungeon(t):
+    flicker = (np.sin(t * 8.0 + _INDEX * 0.5) * 0.3 + 0.7) * (np.sin(t * 15.0 + _INDEX * 1.2) * 0.2 + 0.8)
+    brightness = _u8(flicker * 200 + 55)
+    return _rgb(brightness, _u8(brightness * 0.4), 0)
+
+def combat(t):
+    brightness = _u8(np.full(NUMBER_OF_LEDS, (np.sin(t * 4.0) * 0.5 + 0.5) * 200 + 55))
+    return _rgb(brightness, 0, 0)
+
+def tavern(t):
+    flicker = np.sin(t * 3.0 + _INDEX * 0.3) * 0.15 + 0.85
+    return _rgb(_u8(flicker * 255), _u8(flicker * 180), _u8(flicker * 20))
+
+def darkness(t):
+    return _rgb(5, 0, 10)
+
+def forest(t):
+    dapple = np.sin(t * 2.0 + _INDEX * 0.4) * 0.3 + np.cos(t * 1.5 + _INDEX * 0.6) * 0.2 + 0.5
+    return _rgb(_u8(dapple * 80 + 30), _u8(dapple * 150 + 50), 10)
+
+def stealth(t):
+    return _rgb(0, 5, 25)
+
+def fire(t):
+    flame = np.sin(t * 12.0 + _INDEX * 0.8) * 0.4 + np.cos(t * 20.0 + _INDEX * 1.1) * 0.3 + 0.6
+    return _rgb(_u8(flame * 255), _u8(flame * 100), 0)
+
+def lightning(t):
+    flash_time = np.fmod(t * 3.0, 2.0)
+    if (1.8 < flash_time < 1.95) or (0.3 < flash_time < 0.35):
+        return _rgb(255, 255, 255)
+    return _rgb(20, 10, 40)
+
+def desert(t):
+    brightness = _u8((np.sin(t * 6.0 + _INDEX * 0.3) * 0.1 + 0.9) * 255)
+    return _rgb(brightness, _u8(brightness * 0.9), _u8(brightness * 0.7))
+
+def cave(t):
+    brightness = np.where(np.sin(t * 4.0 + _INDEX * 2.0) > 0.95, 120, 40)
+    return _rgb(_u8(brightness * 0.7), _u8(brightness * 0.8), _u8(brightness))
+
+def healing(t):
+    half = NUMBER_OF_LEDS // 2
+    pulse = np.sin(t * 2.0) * 0.3 + 0.7
+    distance = np.abs(_INDEX - half) / half
+    brightness = _u8(pulse * (1.0 - distance * 0.3) * 200 + 55)
+    return _rgb(brightness, _u8(brightness * 0.8), 0)
+
+def magic(t):
+    sparkle = np.sin(t * 5.0 + _INDEX * 1.5) * 0.4 + np.cos(t * 7.0 + _INDEX * 0.8) * 0.3 + 0.3
+    brightness = _u8(sparkle * 180 + 75)
+    return _rgb(_u8(brightness * 0.8), _u8(brightness * 0.3), brightness)
+
+def city(t):
+    return _rgb(240, 240, 255)
+
+def ocean(t):
+    wave = np.sin(t * 3.0 + _INDEX * 0.2) * 0.3 + np.cos(t * 2.0 + _INDEX * 0.15) * 0.2 + 0.5
+    return _rgb(0, _u8(wave * 120 + 60), _u8(wave * 180 + 75))
+
+def color_wave(t):
+    hue = _u8((np.sin(t * 2 + _INDEX / 32.0) * 0.5 + 0.5) * 255.0)
+    return _hsv_to_rgb(hue, 255, 255)
+
+# Same order as getLedDelegateFunction; anything past the end is color_wave
+PATTERNS = [dungeon, combat, tavern, darkness, forest, stealth, fire, lightning,
+            desert, cave, healing, magic, city, ocean, color_wave]
+
+def get_pattern(effect):
+    """Pattern function for an effect number or name"""
+    if isinstance(effect, str) and not effect.isdigit():
+        for pattern in PATTERNS:
+            if pattern.__name__ == effect:
+                return pattern
+        raise ValueError(f"Unknown pattern: {effect}")
+    return PATTERNS[min(int(effect), len(PATTERNS) - 1)]
+
+def delta_ops(frame, previous=None):
+    """Split frame into (op, start, count) segments relative to previous"""
+    if previous is None:
+        changed = np.ones(NUMBER_OF_LEDS, dtype=bool)
+    else:
+        changed = np.any(frame != previous, axis=1)
+
+    # Segment boundaries: the changed flag flips, or a changed LED differs from its neighbour
+    differs = np.any(frame[1:] != frame[:-1], axis=1)
+    boundary = (changed[1:] != changed[:-1]) | (changed[1:] & differs)
+    starts = np.concatenate(([0], np.nonzero(boundary)[0] + 1))
+    ends = np.concatenate((starts[1:], [NUMBER_OF_LEDS]))
+
+    ops = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        count = end - start
+        if not changed[start]:
+            op = OP_SKIP
+        elif count > 1:
+            op = OP_RUN
+        else:
+            op = OP_LITERAL
+
+        # Merge neighbouring single LEDs into one literal
+        if op == OP_LITERAL and ops and ops[-1][0] == OP_LITERAL:
+            ops[-1][2] += count
+        else:
+            ops.append([op, start, count])
+
+    # Unchanged LEDs at the end need no message at all
+    if ops and ops[-1][0] == OP_SKIP:
+        ops.pop()
+    return ops
+
+def encode_update(frame, previous=None, max_payload=MAX_PAYLOAD_SIZE):
+    """Encode frame as delta/RLE payloads that each fit in max_payload bytes"""
+    payloads = []
+    payload = None
+
+    for op, start, count in delta_ops(frame, previous):
+        while count > 0:
+            # Leading skips are free: a new message starts at an absolute LED index
+            if payload is None and op == OP_SKIP:
+                break
+            if payload is None:
+                payload = bytearray([start])
+
+            space = max_payload - len(payload) - 1
+            if op == OP_SKIP:
+                n = min(count, MAX_OP_COUNT)
+                size = 0
+            elif op == OP_RUN:
+                n = min(count, MAX_OP_COUNT)
+                size = 3
+            else:
+                n = min(count, MAX_OP_COUNT, space // 3)
+                size = 3 * n
+
+            if n <= 0 or size > space:
+                payloads.append(bytes(payload))
+                payload = None
+                continue
+
+            payload.append((op << 6) | (n - 1))
+            if op == OP_RUN:
+                payload += frame[start].tobytes()
+            elif op == OP_LITERAL:
+                payload += frame[start:start + n].tobytes()
+            start += n
+            count -= n
+
+    if payload is not None:
+        payloads.append(bytes(payload))
+    return payloads
+
+def decode_update(payload, frame):
+    """Apply one update payload to frame in place (what the firmware side does)"""
+    index = payload[0]
+    position = 1
+    while position < len(payload):
+        op, count = payload[position] >> 6, (payload[position] & 0x3F) + 1
+        position += 1
+        if op == OP_RUN:
+            frame[index:index + count] = np.frombuffer(payload, dtype=np.uint8, count=3, offset=position)
+            position += 3
+        elif op == OP_LITERAL:
+            frame[index:index + count] = np.frombuffer(payload, dtype=np.uint8, count=3 * count, offset=position).reshape(count, 3)
+            position += 3 * count
+        index += count
+    return frame
+
+class LEDStreamer:
+    """Render a pattern on the host and stream it to the table at a target FPS"""
+
+    def __init__(self, connection, pattern, fps=60, keyframe_interval=120):
+        self.connection = connection
+        self.pattern = pattern
+        self.fps = fps
+        self.keyframe_interval = keyframe_interval  # Resend every LED this often to repair lost updates
+
+    def stream(self, duration_s):
+        """Stream for duration_s seconds and return timing and size statistics"""
+        frame_interval = 1.0 / self.fps
+        previous = None
+        frame_sizes = []
+        message_count = 0
+        late_frames = 0
+
+        start = time.perf_counter()
+        next_frame = start
+        frame_number = 0
+        while True:
+            now = time.perf_counter()
+            if now - start >= duration_s:
+                break
+            if now < next_frame:
+                time.sleep(next_frame - now)
+                continue
+            if now - next_frame > frame_interval:
+                late_frames += 1
+
+            frame = self.pattern(np.float32(now - start))
+            keyframe = self.keyframe_interval and frame_number % self.keyframe_interval == 0
+            payloads = encode_update(frame, None if keyframe else previous)
+
+            data = b''.join(encode_frame(frame_number, payload) for payload in payloads)
+            if data:
+                self.connection.write(data)
+
+            frame_sizes.append(len(data))
+            message_count += len(payloads)
+            previous = frame
+            frame_number += 1
+            next_frame += frame_interval
+
+        elapsed = time.perf_counter() - start
+        raw_size = NUMBER_OF_LEDS * 3 + OVERHEAD
+        average_size = sum(frame_sizes) / len(frame_sizes) if frame_sizes else 0
+        return {
+            'pattern': self.pattern.__name__,
+            'target_fps': self.fps,
+            'frames': frame_number,
+            'achieved_fps': frame_number / elapsed if elapsed > 0 else 0,
+            'late_frames': late_frames,
+            'messages': message_count,
+            'avg_bytes_per_frame': average_size,
+            'max_bytes_per_frame': max(frame_sizes, default=0),
+            'compression_ratio': raw_size / average_size if average_size else float('inf'),
+            'link_bytes_per_sec': sum(frame_sizes) / elapsed if elapsed > 0 else 0,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream host-rendered LED patterns to the table")
+    parser.add_argument('--port', required=True, help="Serial port, or sim://?... for the simulated device")
+    parser.add_argument('--pattern', default='fire', help="Pattern name or effect number (default: fire)")
+    parser.add_argument('--fps', type=float, default=60)
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds to stream")
+    args = parser.parse_args()
+
+    pattern = get_pattern(args.pattern)
+    connection = open_connection(args.port, BAUD_RATE)
+    try:
+        stats = LEDStreamer(connection, pattern, fps=args.fps).stream(args.duration)
+    finally:
+        connection.close()
+
+    print(f"Pattern: {stats['pattern']}")
+    print(f"  Achieved FPS: {stats['achieved_fps']:.1f} / {stats['target_fps']:.1f} ({stats['late_frames']} late frames)")
+    print(f"  Bytes per frame: {stats['avg_bytes_per_frame']:.1f} avg, {stats['max_bytes_per_frame']} max "
+          f"(compression ratio {stats['compression_ratio']:.2f} vs one raw frame)")
+    print(f"  Messages: {stats['messages']}, Link usage: {stats['link_bytes_per_sec']:.0f} bytes/sec")
+
+if __name__ == "__main__":
+    main()
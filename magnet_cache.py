@@ -0,0 +1,159 @@
+"""Persistent cache of force/torque results, keyed by the computation's inputs
+
+Each configuration is stored under the sha256 of a canonical encoding of
+everything the result depends on: both magnets' dimensions and
+polarizations, the source pose, the target pose, meshing, anchor and the
+finite-difference step. Overlapping sweeps therefore share entries point
+by point. Values are the 6 float64s of the (2, 3) result in a SQLite
+table, and the least recently used entries are evicted past max_entries.
+
+The default database lives in the user cache directory ($XDG_CACHE_HOME,
+%LOCALAPPDATA% on Windows, else ~/.cache), not the working tree.
+"""
+import hashlib
+import os
+import sqlite3
+import struct
+import time
+
+import numpy as np
+
+def _user_cache_dir():
+    if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        return os.environ['LOCALAPPDATA']
+    return os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+
+DEFAULT_PATH = os.path.join(_user_cache_dir(), 'table', 'magnet_cache.sqlite')
+
+# Bump when the force model changes so stale results are never returned
+CACHE_VERSION = 1
+
+# Inputs are rounded before hashing so float noise in pose construction still hits
+DECIMALS = 12
+
+# SQLite host parameter limit is 999 on older builds
+_BATCH = 900
+
+_VALUE = struct.Struct('<6d')
+
+def _canonical(values):
+    values = np.round(np.asarray(values, dtype=np.float64).ravel(), DECIMALS) + 0.0  # + 0.0 folds -0.0 into 0.0
+    return values.tobytes()
+
+def _canonical_quats(rotation):
+    """Quaternions with q and -q (the same rotation) mapped to one representative"""
+    quats = np.reshape(rotation.as_quat(), (-1, 4))
+    flip = (quats[:, 3] < 0) | ((quats[:, 3] == 0) & (quats[:, 2] < 0))
+    quats[flip] *= -1
+    return quats
+
+def config_keys(source, target, anchor, eps=1e-5):
+    """One sha256 key per path step of target"""
+    source_quat = _canonical_quats(source.orientation)[0]
+    common = b''.join([
+        struct.pack('<I', CACHE_VERSION),
+        type(source).__name__.encode(), _canonical(source.dimension), _canonical(source.polarization),
+        _canonical(source.position), _canonical(source_quat),
+        type(target).__name__.encode(), _canonical(target.dimension), _canonical(target.polarization),
+        repr(target.meshing).encode(), _canonical(anchor), _canonical(eps),
+    ])
+
+    positions = np.round(np.reshape(target.position, (-1, 3)), DECIMALS) + 0.0
+    quats = np.round(_canonical_quats(target.orientation), DECIMALS) + 0.0
+    poses = np.ascontiguousarray(np.hstack((positions, quats)))
+    return [hashlib.sha256(common + pose.tobytes()).digest() for pose in poses]
+
+class ForceCache:
+    """SQLite-backed LRU cache of (2, 3) force/torque arrays"""
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=1_000_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS ft (key BLOB PRIMARY KEY, value BLOB NOT NULL, used REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ft_used ON ft (used)")
+        self._count = self._db.execute("SELECT COUNT(*) FROM ft").fetchone()[0]  # Kept up to date by put_many
+
+    def __len__(self):
+        return self._count
+
+    def get_many(self, keys):
+        """{key: (2, 3) array} for the keys that are cached"""
+        found = {}
+        for start in range(0, len(keys), _BATCH):
+            batch = keys[start:start + _BATCH]
+            placeholders = ','.join('?' * len(batch))
+            for key, value in self._db.execute(f"SELECT key, value FROM ft WHERE key IN ({placeholders})", batch):
+                found[key] = np.array(_VALUE.unpack(value)).reshape(2, 3)
+
+        if found:
+            now = time.time()
+            with self._db:
+                self._db.executemany("UPDATE ft SET used = ? WHERE key = ?", ((now, key) for key in found))
+
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, keys, values):
+        """Store one (2, 3) array per key, evicting the least recently used past max_entries"""
+        now = time.time()
+        rows = [(key, _VALUE.pack(*np.asarray(value, dtype=np.float64).ravel()), now) for key, value in zip(keys, values)]
+        with self._db:
+            # Keys encode every input, so an existing row already holds this value
+            self._count += self._db.executemany("INSERT OR IGNORE INTO ft (key, value, used) VALUES (?, ?, ?)", rows).rowcount
+
+            if self._count > self.max_entries:
+                # Recount once per evicting batch in case another process shares the file
+                self._count = self._db.execute("SELECT COUNT(*) FROM ft").fetchone()[0]
+                excess = self._count - self.max_entries
+                if excess > 0:
+                    self._db.execute("DELETE FROM ft WHERE key IN (SELECT key FROM ft ORDER BY used LIMIT ?)", (excess,))
+                    self.evictions += excess
+                    self._count -= excess
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._db:
+            self._db.execute("DELETE FROM ft")
+        self._count = 0
+
+    def close(self):
+        self._db.close()
+
+def cached_path_ft(cache, source, target, anchor, eps, evaluate):
+    """Results for every path step of target, computing only the uncached steps with evaluate(target)"""
+    keys = config_keys(source, target, anchor, eps)
+    found = cache.get_many(keys)
+
+    missing = [index for index, key in enumerate(keys) if key not in found]
+    if missing:
+        from scipy.spatial.transform import Rotation as R
+
+        # Evaluate the missing steps only, as a shorter path on the same target
+        quats = np.reshape(target.orientation.as_quat(), (-1, 4))
+        subset = target.copy(position=np.reshape(target.position, (-1, 3))[missing],
+                             orientation=R.from_quat(quats[missing]))
+        subset.meshing = target.meshing
+        computed = evaluate(subset)
+        cache.put_many([keys[index] for index in missing], computed)
+        found.update(zip((keys[index] for index in missing), computed))
+
+    return np.array([found[key] for key in keys]).reshape(len(keys), 2, 3)
@@ -0,0 +1,201 @@
+"""Evaluate large magnet design grids on every core
+
+The grid spans gap, angle, cylinder diameter and length, polarization and
+meshing. It is ordered so that rows sharing a magnet design (dimensions,
+polarization, meshing) are contiguous, then split into chunks that never
+cross a design boundary, so each chunk is one magnet_model.sweep_ft call.
+Chunks run in a ProcessPoolExecutor and each finished chunk is saved as
+an .npy checkpoint, so an interrupted study resumes where it stopped.
+
+Rows whose magnets intersect (magnet_model.overlapping) are still
+evaluated, but their overlap field is set: the field model means nothing
+there, so downstream users should mask them out.
+"""
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import magnet_model
+
+# Meshing is magpylib_force's target element count; 125 is the scripts' (5, 5, 5)
+DEFAULT_MESHING = int(np.prod(magnet_model.MESHING))
+
+PARAMETERS = ['gap_mm', 'angle_deg', 'diameter_m', 'length_m', 'pol_T', 'meshing']
+GRID_DTYPE = np.dtype([
+    ('gap_mm', 'f8'),
+    ('angle_deg', 'f8'),
+    ('diameter_m', 'f8'),
+    ('length_m', 'f8'),
+    ('pol_T', 'f8'),
+    ('meshing', 'i8'),
+    ('force', 'f8', (3,)),
+    ('torque', 'f8', (3,)),
+    ('overlap', '?'),
+])
+
+def make_grid(gaps_mm, angles_deg, diameters_m=(magnet_model.CYLINDER_DIAMETER_M,),
+              lengths_m=(magnet_model.CYLINDER_LENGTH_M,), pols_T=(magnet_model.MAGNET_POL_T,),
+              meshings=(DEFAULT_MESHING,)):
+    """Structured array with one row per combination, results set to NaN"""
+    axes = [diameters_m, lengths_m, pols_T, meshings, gaps_mm, angles_deg]
+    # Design parameters vary slowest so each design is one contiguous block
+    columns = [column.ravel() for column in np.meshgrid(*[np.asarray(axis) for axis in axes], indexing='ij')]
+
+    grid = np.zeros(len(columns[0]), dtype=GRID_DTYPE)
+    for name, column in zip(['diameter_m', 'length_m', 'pol_T', 'meshing', 'gap_mm', 'angle_deg'], columns):
+        grid[name] = column
+    grid['force'] = np.nan
+    grid['torque'] = np.nan
+    return grid
+
+def make_chunks(grid, chunk_size=256):
+    """(start, stop) row ranges of at most chunk_size rows within one design"""
+    design = np.column_stack([grid[name] for name in ['diameter_m', 'length_m', 'pol_T', 'meshing']])
+    boundaries = np.nonzero(np.any(design[1:] != design[:-1], axis=1))[0] + 1
+    starts = np.concatenate(([0], boundaries))
+    stops = np.concatenate((boundaries, [len(grid)]))
+
+    chunks = []
+    for start, stop in zip(starts.tolist(), stops.tolist()):
+        for chunk_start in range(start, stop, chunk_size):
+            chunks.append((chunk_start, min(chunk_start + chunk_size, stop)))
+    return chunks
+
+def evaluate_chunk(rows, layout):
+    """Force and torque (n, 2, 3) for grid rows that share one design"""
+    first = rows[0]
+    return magnet_model.sweep_ft(rows['gap_mm'], rows['angle_deg'], layout,
+                                 diameter_m=first['diameter_m'], length_m=first['length_m'], pol_T=first['pol_T'],
+                                 meshing=int(first['meshing']))
+
+def chunk_overlap(rows, layout):
+    """Which grid rows that share one design have intersecting magnets"""
+    first = rows[0]
+    return magnet_model.overlapping(rows['gap_mm'], rows['angle_deg'], layout, first['diameter_m'], first['length_m'])
+
+def _checkpoint_path(checkpoint_dir, start, stop):
+    return os.path.join(checkpoint_dir, f"chunk_{start:09d}_{stop:09d}.npy")
+
+def _prepare_checkpoints(checkpoint_dir, grid, layout, chunk_size):
+    """Create checkpoint_dir, refusing to resume a different study"""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    manifest_path = os.path.join(checkpoint_dir, 'grid.npy')
+    manifest = np.zeros(len(grid), dtype=[(name, GRID_DTYPE[name]) for name in PARAMETERS])
+    for name in PARAMETERS:
+        manifest[name] = grid[name]
+
+    settings_path = os.path.join(checkpoint_dir, 'settings.txt')
+    settings = f"layout={layout} chunk_size={chunk_size}\n"
+
+    have_manifest, have_settings = os.path.exists(manifest_path), os.path.exists(settings_path)
+    if have_manifest and have_settings:
+        with open(settings_path) as f:
+            same_settings = f.read() == settings
+        if not same_settings or not np.array_equal(np.load(manifest_path), manifest):
+            raise ValueError(f"{checkpoint_dir} holds checkpoints for a different grid")
+    elif (have_manifest or have_settings) and glob.glob(os.path.join(checkpoint_dir, 'chunk_*.npy')):
+        missing = 'settings.txt' if have_manifest else 'grid.npy'
+        raise ValueError(f"{checkpoint_dir} has chunk checkpoints but no {missing}, so they cannot be matched "
+                         f"to this grid; remove the directory or use another --checkpoint-dir")
+    else:
+        # Nothing to resume (a run interrupted between the two writes leaves no chunks yet)
+        np.save(manifest_path, manifest)
+        with open(settings_path, 'w') as f:
+            f.write(settings)
+
+def _save_checkpoint(path, ft):
+    # Write then rename so an interrupted save never looks like a finished chunk
+    temporary_path = path + '.tmp.npy'
+    np.save(temporary_path, ft)
+    os.replace(temporary_path, path)
+
+def run_grid(grid, layout='centered', workers=None, chunk_size=256, checkpoint_dir=None, progress_interval_s=2.0):
+    """Fill in force and torque for every row of grid, in place, and return it"""
+    chunks = make_chunks(grid, chunk_size)
+    pending = []
+    done_rows = 0
+
+    if checkpoint_dir:
+        _prepare_checkpoints(checkpoint_dir, grid, layout, chunk_size)
+    for start, stop in chunks:
+        grid['overlap'][start:stop] = chunk_overlap(grid[start:stop], layout)
+        path = _checkpoint_path(checkpoint_dir, start, stop) if checkpoint_dir else None
+        if path and os.path.exists(path):
+            ft = np.load(path)
+            grid['force'][start:stop] = ft[:, 0]
+            grid['torque'][start:stop] = ft[:, 1]
+            done_rows += stop - start
+        else:
+            pending.append((start, stop))
+
+    if done_rows:
+        print(f"Resumed {done_rows}/{len(grid)} configurations from {checkpoint_dir}")
+    if not pending:
+        return grid
+
+    workers = workers or os.cpu_count()
+    print(f"Evaluating {len(grid) - done_rows} configurations in {len(pending)} chunks on {workers} workers...")
+
+    start_time = time.perf_counter()
+    resumed_rows = done_rows
+    next_report = start_time + progress_interval_s
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(evaluate_chunk, grid[start:stop], layout): (start, stop) for start, stop in pending}
+        for future in as_completed(futures):
+            start, stop = futures[future]
+            ft = future.result()
+            grid['force'][start:stop] = ft[:, 0]
+            grid['torque'][start:stop] = ft[:, 1]
+            if checkpoint_dir:
+                _save_checkpoint(_checkpoint_path(checkpoint_dir, start, stop), ft)
+            done_rows += stop - start
+
+            now = time.perf_counter()
+            if now >= next_report or done_rows == len(grid):
+                next_report = now + progress_interval_s
+                rate = (done_rows - resumed_rows) / (now - start_time)
+                eta_s = (len(grid) - done_rows) / rate if rate > 0 else float('inf')
+                print(f"  [{done_rows:>9}/{len(grid)}] {rate:,.0f} configs/sec, ETA {eta_s:.0f}s")
+
+    return grid
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a face magnet design grid on every core")
+    parser.add_argument('--layout', choices=sorted(magnet_model.LAYOUTS), default='centered')
+    parser.add_argument('--gap', nargs=3, type=float, default=[1, 20, 20], metavar=('START', 'STOP', 'NUM'),
+                        help="Gap range in mm (default: 1 20 20)")
+    parser.add_argument('--angle', nargs=3, type=float, default=[0, 60, 13], metavar=('START', 'STOP', 'NUM'),
+                        help="Angle range in degrees (default: 0 60 13)")
+    parser.add_argument('--diameter', nargs='+', type=float, default=[magnet_model.CYLINDER_DIAMETER_M], help="Diameters in m")
+    parser.add_argument('--length', nargs='+', type=float, default=[magnet_model.CYLINDER_LENGTH_M], help="Lengths in m")
+    parser.add_argument('--pol', nargs='+', type=float, default=[magnet_model.MAGNET_POL_T], help="Polarizations in T")
+    parser.add_argument('--meshing', nargs='+', type=int, default=[DEFAULT_MESHING], help="Target mesh element counts")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: every core)")
+    parser.add_argument('--chunk-size', type=int, default=256, help="Configurations per task")
+    parser.add_argument('--checkpoint-dir', help="Save finished chunks here and resume from them")
+    parser.add_argument('--output', default='magnet_grid.npy', help="Structured .npy output file")
+    args = parser.parse_args()
+
+    gaps_mm = np.linspace(args.gap[0], args.gap[1], int(args.gap[2]))
+    angles_deg = np.linspace(args.angle[0], args.angle[1], int(args.angle[2]))
+    grid = make_grid(gaps_mm, angles_deg, args.diameter, args.length, args.pol, args.meshing)
+
+    start_time = time.perf_counter()
+    try:
+        run_grid(grid, args.layout, args.workers, args.chunk_size, args.checkpoint_dir)
+    except KeyboardInterrupt:
+        print("\nStopped by user" + (f", rerun with --checkpoint-dir {args.checkpoint_dir} to resume" if args.checkpoint_dir else ""))
+        return
+
+    np.save(args.output, grid)
+    print(f"Saved {len(grid)} configurations to {args.output} in {time.perf_counter() - start_time:.1f}s")
+    overlaps = np.count_nonzero(grid['overlap'])
+    if overlaps:
+        print(f"{overlaps} configurations have overlapping magnets (overlap field set); their force/torque is meaningless")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""Force and torque between cylindrical face magnets of adjacent dodecagon tiles
+
+The geometry comes from the two standalone scripts:
+    'centered'  minimun_magnet.py - target rotated about its own centre and
+                placed at distance L + gap along the rotated axis
+    'hinged'    magnet2.py - target placed face to face at L + gap, then
+                hinged about the centre of the source's face
+The source magnet sits at the origin with its axis along +Z.
+
+sweep_ft evaluates many (gap, angle) configurations at once. They are
+encoded as a position/orientation path on one target Cylinder and
+evaluated with a single field computation over every mesh point of every
+path step, so a sweep costs one magpylib call instead of one object and
+one getFT call per configuration.
+
+magpylib (which pulls in matplotlib), scipy and magpylib_force take about
+a second to import. They are imported inside the functions that need
+them, so importing this module, running --help or answering from a
+lookup table stays fast. run_cli is the shared command line of
+minimun_magnet.py and magnet2.py.
+"""
+import argparse
+import json
+import sys
+import time
+import warnings
+
+import numpy as np
+
+# --- Geometry and magnet properties shared by both scripts (SI units) ---
+CYLINDER_DIAMETER_M = 0.012  # 12 mm diameter
+CYLINDER_LENGTH_M = 0.015   # 15 mm length
+MAGNET_POL_T = 1.3  # Typical NdFeB polarization, stands in for the electromagnet core
+MESHING = (5, 5, 5)
+ANCHOR = (0, 0, 0)
+EPS = 1e-5  # Finite-difference step for the field gradient (getFT's default)
+
+# Sign of the target polarization relative to the source in each script
+LAYOUTS = {
+    'centered': 1,  # minimun_magnet.py
+    'hinged': -1,   # magnet2.py (opposite polarization to attract)
+}
+
+# Configurations per field evaluation; bounds memory at about 70 MB for the default mesh
+CHUNK_SIZE = 4096
+
+def target_polarization(layout, pol_T=MAGNET_POL_T):
+    """Default target polarization: the source's pol_T with the layout's sign"""
+    return LAYOUTS[layout] * pol_T
+
+def target_poses(gaps_mm, angles_deg, layout='centered', length_m=CYLINDER_LENGTH_M):
+    """Target positions (n, 3) and orientations (Rotation of length n) for each gap/angle pair"""
+    from scipy.spatial.transform import Rotation as R
+
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout}")
+
+    gaps_mm, angles_deg = np.broadcast_arrays(np.atleast_1d(np.asarray(gaps_mm, dtype=float)),
+                                              np.atleast_1d(np.asarray(angles_deg, dtype=float)))
+    gaps_mm, angles_deg = gaps_mm.ravel(), angles_deg.ravel()
+
+    rotation = R.from_euler('y', angles_deg[:, None], degrees=True)
+    center_to_center = length_m + gaps_mm / 1000
+
+    if layout == 'centered':
+        angles_rad = np.deg2rad(angles_deg)
+        positions = np.column_stack((np.sin(angles_rad) * center_to_center,
+                                     np.zeros_like(center_to_center),
+                                     np.cos(angles_rad) * center_to_center))
+    else:
+        # Start face to face, then hinge about the centre of the source's face
+        pivot = np.array([0, 0, length_m / 2])
+        start = np.column_stack((np.zeros_like(center_to_center), np.zeros_like(center_to_center), center_to_center))
+        positions = pivot + rotation.apply(start - pivot)
+
+    return positions, rotation
+
+def _surface_points(radius_m, length_m, samples):
+    """Points on a cylinder's rims, end faces and side, in its own frame (axis along Z)"""
+    angles = np.linspace(0, 2 * np.pi, samples, endpoint=False)
+    ring = np.column_stack((np.cos(angles), np.sin(angles)))
+    points = [np.array([[0, 0, -length_m / 2], [0, 0, length_m / 2]])]
+    for z in np.linspace(-length_m / 2, length_m / 2, 7):
+        # End faces get inner rings too; the side only its circumference
+        for r in ([1, 2 / 3, 1 / 3] if abs(z) == length_m / 2 else [1]):
+            points.append(np.column_stack((ring * radius_m * r, np.full(samples, z))))
+    return np.concatenate(points)
+
+def _inside(points, radius_m, length_m, tolerance_m=1e-9):
+    """Which points (.., 3) lie strictly inside a cylinder at the origin with its axis along Z"""
+    return (np.abs(points[..., 2]) < length_m / 2 - tolerance_m) & \
+           (np.hypot(points[..., 0], points[..., 1]) < radius_m - tolerance_m)
+
+def overlapping(gaps_mm, angles_deg, layout='centered', diameter_m=CYLINDER_DIAMETER_M, length_m=CYLINDER_LENGTH_M,
+                samples=90):
+    """True for the gap/angle pairs where the target cylinder intersects the source
+
+    The gap is measured along the axis, so at small gaps and large angles
+    a rim can cut into the other magnet. Points sampled on each cylinder's
+    surface are tested against the other's volume, which finds the rim
+    and corner contacts these layouts produce. The field model means
+    nothing there, and refining the mesh only makes it diverge.
+    """
+    positions, rotation = target_poses(gaps_mm, angles_deg, layout, length_m)
+    radius_m = diameter_m / 2
+    surface = _surface_points(radius_m, length_m, samples)
+    matrices = rotation.as_matrix()
+
+    target_in_source = np.einsum('nij,kj->nki', matrices, surface) + positions[:, None, :]
+    source_in_target = np.einsum('nji,nkj->nki', matrices, surface[None, :, :] - positions[:, None, :])
+    return _inside(target_in_source, radius_m, length_m).any(axis=1) | _inside(source_in_target, radius_m, length_m).any(axis=1)
+
+def make_source(diameter_m=CYLINDER_DIAMETER_M, length_m=CYLINDER_LENGTH_M, pol_T=MAGNET_POL_T):
+    """Stationary source magnet at the origin, polarized along +Z"""
+    import magpylib as magpy
+    return magpy.magnet.Cylinder(polarization=(0, 0, pol_T), dimension=(diameter_m, length_m))
+
+def make_target(gaps_mm, angles_deg, layout='centered', diameter_m=CYLINDER_DIAMETER_M,
+                length_m=CYLINDER_LENGTH_M, pol_T=None, meshing=MESHING):
+    """Target magnet whose path visits every gap/angle configuration"""
+    import magpylib as magpy
+
+    if pol_T is None:
+        pol_T = target_polarization(layout)
+
+    positions, rotation = target_poses(gaps_mm, angles_deg, layout, length_m)
+    target = magpy.magnet.Cylinder(polarization=(0, 0, pol_T), dimension=(diameter_m, length_m),
+                                   position=positions, orientation=rotation)
+    target.meshing = meshing
+    return target
+
+def path_ft(sources, target, anchor=ANCHOR, eps=EPS, chunk_size=CHUNK_SIZE):
+    """Force and torque on a magnet target at every step of its path, shape (n, 2, 3)
+
+    Same formulation as magpylib_force.getFT (moments on the target mesh,
+    finite-difference field gradient), which does not accept target paths.
+    Sources must be stationary.
+    """
+    import magpylib as magpy
+    from magpylib_force.meshing import mesh_target
+    from scipy.spatial.transform import Rotation as R
+
+    positions = np.reshape(target.position, (-1, 3))
+    quats = np.reshape(target.orientation.as_quat(), (-1, 4))
+    n = len(positions)
+
+    mesh = mesh_target(target)  # Local frame, identical for every path step
+    volume = np.pi * target.dimension[0] ** 2 / 4 * target.dimension[1]
+    moment = np.asarray(target.magnetization) * volume / len(mesh)
+    eps_vec = np.array([(0, 0, 0), (eps, 0, 0), (-eps, 0, 0), (0, eps, 0), (0, -eps, 0), (0, 0, eps), (0, 0, -eps)])
+    anchor = np.asarray(anchor, dtype=float)
+
+    ft = np.empty((n, 2, 3))
+    for start in range(0, n, chunk_size):
+        rotation = R.from_quat(quats[start:start + chunk_size])
+        count = len(rotation)
+
+        # Mesh points of every step: (count, mesh, 3)
+        points = np.einsum('nij,mj->nmi', rotation.as_matrix(), mesh) + positions[start:start + count, None, :]
+        moments = np.broadcast_to(rotation.apply(moment)[:, None, :], points.shape)
+
+        field_points = points[:, :, None, :] + eps_vec  # (count, mesh, 7, 3)
+        field = magpy.getB(sources, field_points.reshape(-1, 3), sumup=True).reshape(field_points.shape)
+        gradient = (field[:, :, 1::2] - field[:, :, 2::2]) / (2 * eps)  # (count, mesh, axis, component)
+
+        forces = np.einsum('nmak,nmk->nma', gradient, moments)
+        torques = np.cross(moments, field[:, :, 0]) + np.cross(points - anchor, forces)
+
+        ft[start:start + count, 0] = forces.sum(axis=1)
+        ft[start:start + count, 1] = torques.sum(axis=1)
+    return ft
+
+def sweep_ft(gaps_mm, angles_deg, layout='centered', diameter_m=CYLINDER_DIAMETER_M, length_m=CYLINDER_LENGTH_M,
+             pol_T=MAGNET_POL_T, target_pol_T=None, meshing=MESHING, anchor=ANCHOR, cache=None):
+    """Force and torque on the target for every gap/angle pair, shape (n_configs, 2, 3)
+
+    gaps_mm and angles_deg broadcast against each other. Row 0 of each
+    result is the force (N), row 1 the torque (N*m) about anchor. The
+    target defaults to pol_T with the layout's sign. With a
+    magnet_cache.ForceCache only the configurations it lacks are computed.
+    """
+    if target_pol_T is None:
+        target_pol_T = target_polarization(layout, pol_T)
+
+    source = make_source(diameter_m, length_m, pol_T)
+    target = make_target(gaps_mm, angles_deg, layout, diameter_m, length_m, target_pol_T, meshing)
+    if cache is None:
+        return path_ft(source, target, anchor)
+
+    from magnet_cache import cached_path_ft
+    return cached_path_ft(cache, source, target, anchor, EPS, lambda subset: path_ft(source, subset, anchor))
+
+def pair_ft(gap_mm, angle_deg, layout='centered', **kwargs):
+    """Force and torque for one configuration, shape (2, 3)"""
+    return sweep_ft(gap_mm, angle_deg, layout, **kwargs)[0]
+
+def refine_ft(gaps_mm, angles_deg, layout='centered', tolerance=1e-3, start_meshing=27, growth=1.5, max_meshing=4000,
+              force_atol=1e-6, torque_atol=1e-9, **kwargs):
+    """Force and torque with the mesh refined per configuration until it converges
+
+    Every configuration starts at start_meshing elements and the mesh grows
+    by growth per level. A configuration has converged once the relative
+    change of both force and torque stays within tolerance for two level
+    steps in a row. magpylib_force's cell layout changes shape between
+    element counts, so one lucky agreement is not enough. force_atol and
+    torque_atol keep near-zero components from never converging.
+    Converged configurations drop out, so only the sharp near-field ones
+    pay for fine meshes.
+
+    Returns (ft, meshing, error, converged): ft is (n, 2, 3) from the
+    finest mesh each configuration used, meshing the element count of
+    that mesh, error the larger relative change over its last two steps
+    (an estimate of the remaining discretization error) and converged
+    whether error reached tolerance before max_meshing. Configurations
+    whose magnets overlap are not computed: their ft is NaN. Both cases
+    are reported with warnings.warn.
+    """
+    gaps_mm, angles_deg = np.broadcast_arrays(np.atleast_1d(np.asarray(gaps_mm, dtype=float)),
+                                              np.atleast_1d(np.asarray(angles_deg, dtype=float)))
+    gaps_mm, angles_deg = gaps_mm.ravel(), angles_deg.ravel()
+    n = len(gaps_mm)
+
+    overlap = overlapping(gaps_mm, angles_deg, layout, kwargs.get('diameter_m', CYLINDER_DIAMETER_M),
+                          kwargs.get('length_m', CYLINDER_LENGTH_M))
+    active = np.nonzero(~overlap)[0]
+
+    meshing = int(start_meshing)
+    ft = np.full((n, 2, 3), np.nan)
+    if len(active):
+        ft[active] = sweep_ft(gaps_mm[active], angles_deg[active], layout, meshing=meshing, **kwargs)
+    meshing_used = np.where(overlap, 0, meshing)
+    error = np.full(n, np.inf)
+    last_change = np.full(n, np.inf)
+
+    while len(active):
+        next_meshing = int(np.ceil(meshing * growth))
+        if next_meshing > max_meshing:
+            break
+        meshing = next_meshing
+
+        refined = sweep_ft(gaps_mm[active], angles_deg[active], layout, meshing=meshing, **kwargs)
+        change = refined - ft[active]
+        force_error = np.linalg.norm(change[:, 0], axis=1) / (np.linalg.norm(refined[:, 0], axis=1) + force_atol)
+        torque_error = np.linalg.norm(change[:, 1], axis=1) / (np.linalg.norm(refined[:, 1], axis=1) + torque_atol)
+
+        change = np.maximum(force_error, torque_error)
+
+        ft[active] = refined
+        meshing_used[active] = meshing
+        error[active] = np.maximum(change, last_change[active])
+        last_change[active] = change
+        active = active[error[active] > tolerance]
+
+    converged = error <= tolerance
+    if np.any(overlap):
+        warnings.warn(f"{np.count_nonzero(overlap)} of {n} configurations have overlapping magnets "
+                      f"and were not computed (force/torque is NaN)", stacklevel=2)
+    unconverged = ~converged & ~overlap
+    if np.any(unconverged):
+        warnings.warn(f"{np.count_nonzero(unconverged)} of {n} configurations did not converge to {tolerance:g} "
+                      f"by max_meshing={max_meshing} (largest error {error[unconverged].max():.3g})", stacklevel=2)
+    return ft, meshing_used, error, converged
+
+def _print_result(gap_mm, angle_deg, force_N, torque_Nm, layout):
+    print(f"\n--- Simulation Results ({gap_mm:g} mm gap, {angle_deg:g} degrees) ---")
+    print(f"Force vector (Fx, Fy, Fz):  ({force_N[0]:.4f}, {force_N[1]:.4f}, {force_N[2]:.4f}) Newtons")
+    print(f"Torque vector (Tx, Ty, Tz): ({torque_Nm[0]:.4f}, {torque_Nm[1]:.4f}, {torque_Nm[2]:.4f}) Newton-meters")
+
+    # A negative Fz pulls the target towards the source; Fx shears the faces apart.
+    # Each script keeps its own summary lines.
+    if layout == 'centered':
+        print(f"\nPrimary Attractive Force: {-force_N[2]:.4f} N")
+        print(f"Shear (Sliding) Force:    {force_N[0]:.4f} N")
+    else:
+        print(f"\nAttractive Force Component (Z-axis): {-force_N[2]:.4f} N")
+        print(f"Shear Force Component (X-axis):      {force_N[0]:.4f} N")
+        print(f"Total Force Magnitude:               {np.linalg.norm(force_N):.4f} N")
+
+def run_cli(layout, gap_mm, angle_deg, description, start_time=None, argv=None):
+    """Command line shared by the two-magnet scripts
+
+    start_time is the script's perf_counter at its first line, so --timing
+    can include the cost of importing this module.
+    """
+    start_time = time.perf_counter() if start_time is None else start_time
+    timing = {'startup_s': time.perf_counter() - start_time}
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--gap', nargs='+', type=float, default=[gap_mm], help=f"Face gap(s) in mm (default: {gap_mm:g})")
+    parser.add_argument('--angle', nargs='+', type=float, default=[angle_deg],
+                        help=f"Angle(s) between the faces in degrees (default: {angle_deg:g})")
+    parser.add_argument('--grid', action='store_true', help="Evaluate every gap with every angle instead of pairing them")
+    parser.add_argument('--meshing', type=int, help="Target mesh element count (default: the scripts' 5x5x5)")
+    method = parser.add_mutually_exclusive_group()
+    method.add_argument('--refine', type=float, metavar='TOL', help="Refine the mesh until force/torque converge within TOL")
+    method.add_argument('--dipole', type=float, metavar='TOL',
+                        help="Use the dipole approximation where its estimated error is within TOL")
+    method.add_argument('--table', help="Interpolate from a magnet_table.py table instead of computing (no magpylib import)")
+    parser.add_argument('--cache', nargs='?', const='', help="Reuse results from a ForceCache database (default path if none given)")
+    parser.add_argument('--json', help="Write results as JSON to this file ('-' for stdout)")
+    parser.add_argument('--npy', help="Write the (n, 2, 3) force/torque array to this .npy file")
+    parser.add_argument('--show', action='store_true', help="Show the magnet geometry (matplotlib, blocks until closed)")
+    parser.add_argument('--timing', action='store_true', help="Report startup, import and compute times on stderr")
+    args = parser.parse_args(argv)
+
+    if args.grid:
+        gaps_mm, angles_deg = (axis.ravel() for axis in np.meshgrid(args.gap, args.angle, indexing='ij'))
+    else:
+        if len(args.gap) != len(args.angle) and 1 not in (len(args.gap), len(args.angle)):
+            parser.error(f"--gap has {len(args.gap)} values and --angle {len(args.angle)}; "
+                         f"give the same number of each, a single value for one of them, or --grid")
+        gaps_mm, angles_deg = (axis.ravel() for axis in np.broadcast_arrays(args.gap, args.angle))
+    meshing = args.meshing or MESHING
+    quiet = args.json == '-'
+    if not quiet:
+        print(f"Simulating {len(gaps_mm)} configuration(s) of the '{layout}' layout...")
+
+    extra = {}
+    phase_start = time.perf_counter()
+    if args.table:
+        from magnet_table import LookupTable
+        table = LookupTable(args.table)
+        if table.axes['layout'] != layout:
+            parser.error(f"{args.table} was built for the '{table.axes['layout']}' layout")
+        ft = table.query(gaps_mm, angles_deg)
+        extra['in_table'] = table.in_range(gaps_mm, angles_deg).tolist()
+        overlap = table.overlapping(gaps_mm, angles_deg)
+        extra['overlap'] = overlap.tolist()
+        for gap, angle in zip(gaps_mm[overlap], angles_deg[overlap]):
+            print(f"Warning: {gap:g} mm, {angle:g} degrees: the table's magnets overlap there, no value",
+                  file=sys.stderr)
+    else:
+        if args.timing:
+            # Pay for the heavy imports up front so they show up separately
+            import magpylib  # noqa: F401
+            import magpylib_force  # noqa: F401
+            from scipy.spatial.transform import Rotation  # noqa: F401
+            timing['imports_s'] = time.perf_counter() - phase_start
+            phase_start = time.perf_counter()
+
+        cache = None
+        if args.cache is not None:
+            from magnet_cache import DEFAULT_PATH, ForceCache
+            cache = ForceCache(args.cache or DEFAULT_PATH)
+
+        if args.refine is not None:
+            with warnings.catch_warnings():
+                # Reported per configuration below instead
+                warnings.simplefilter('ignore')
+                ft, meshing_used, error, converged = refine_ft(gaps_mm, angles_deg, layout, tolerance=args.refine,
+                                                               cache=cache)
+            extra['meshing'] = meshing_used.tolist()
+            extra['error'] = error.tolist()
+            extra['converged'] = converged.tolist()
+            for gap, angle, meshing_count, config_error in zip(gaps_mm[~converged], angles_deg[~converged],
+                                                                meshing_used[~converged], error[~converged]):
+                if meshing_count == 0:
+                    print(f"Warning: {gap:g} mm, {angle:g} degrees: the magnets overlap, not computed",
+                          file=sys.stderr)
+                else:
+                    print(f"Warning: {gap:g} mm, {angle:g} degrees: not converged to {args.refine:g} "
+                          f"(error {config_error:.3g} at meshing {meshing_count})", file=sys.stderr)
+        elif args.dipole is not None:
+            from magnet_dipole import fast_sweep_ft
+            ft, error, exact = fast_sweep_ft(gaps_mm, angles_deg, layout, tolerance=args.dipole, meshing=meshing, cache=cache)
+            extra['error'] = error.tolist()
+            extra['exact'] = exact.tolist()
+        else:
+            ft = sweep_ft(gaps_mm, angles_deg, layout, meshing=meshing, cache=cache)
+
+        if cache is not None:
+            extra['cache'] = cache.stats()
+            cache.close()
+    timing['compute_s'] = time.perf_counter() - phase_start
+
+    if not quiet:
+        for gap, angle, (force_N, torque_Nm) in zip(gaps_mm, angles_deg, ft):
+            _print_result(gap, angle, force_N, torque_Nm, layout)
+
+    if args.npy:
+        np.save(args.npy, ft)
+    if args.json:
+        document = {
+            'layout': layout,
+            'meshing': meshing if isinstance(meshing, int) else list(meshing),
+            'gap_mm': gaps_mm.tolist(),
+            'angle_deg': angles_deg.tolist(),
+            'force_N': ft[:, 0].tolist(),
+            'torque_Nm': ft[:, 1].tolist(),
+            **extra,
+            'timing': timing,
+        }
+        if args.json == '-':
+            json.dump(document, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, 'w') as f:
+                json.dump(document, f, indent=2)
+
+    timing['total_s'] = time.perf_counter() - start_time
+    if args.timing:
+        print(' '.join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in timing.items()), file=sys.stderr)
+
+    if args.show:
+        import magpylib as magpy
+        print("\nShowing system geometry...")
+        magpy.show(make_source(), make_target(gaps_mm, angles_deg, layout, meshing=meshing), backend='matplotlib')
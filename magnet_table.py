@@ -0,0 +1,206 @@
+"""Precomputed force/torque table for runtime queries
+
+build_table evaluates one face magnet layout over a (gap, angle) grid and
+writes the result as a plain .npy array of shape
+(sign, gap, angle, 2, 3), with a JSON sidecar describing the axes.
+Sign index 0 is the target polarization reversed, index 1 the layout's
+own. Force and torque are linear in the target's polarization, so the
+reversed half is the negation of the computed one.
+
+Force changes steeply at small gaps, so the gap axis is geometrically
+spaced by default and interpolated in log(gap), which puts the table's
+points where the curvature is.
+
+Grid points whose magnets intersect (magnet_model.overlapping) are
+stored as NaN and listed in the sidecar's overlap mask, so a query that
+interpolates from one returns NaN and LookupTable.overlapping flags it.
+
+LookupTable reads only the sidecar up front and maps the array on first
+query (np.load with mmap_mode='r'), so opening a table costs almost
+nothing. Queries interpolate bilinearly over whole batches at once.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+SIGNS = (-1, 1)
+
+GAP_SPACINGS = ('geometric', 'linear')
+
+def gap_axis(start_mm, stop_mm, num, spacing='geometric'):
+    """Gap axis values; geometric spacing is denser at small gaps"""
+    if spacing == 'geometric':
+        if start_mm <= 0:
+            raise ValueError("A geometric gap axis must start above 0 mm")
+        return np.geomspace(start_mm, stop_mm, num)
+    return np.linspace(start_mm, stop_mm, num)
+
+def sidecar_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+def build_table(path, gaps_mm, angles_deg, layout='centered', meshing=None, workers=None, gap_spacing='geometric'):
+    """Evaluate the grid, write path and its JSON sidecar, and return the axes
+
+    gap_spacing selects how queries interpolate between gaps: 'geometric'
+    in log(gap) (use with gap_axis(..., 'geometric')), 'linear' in gap.
+    """
+    # Heavy magnet imports are only needed to build a table, never to query one
+    import magnet_grid
+
+    meshing = meshing or magnet_grid.DEFAULT_MESHING
+    gaps_mm = np.asarray(gaps_mm, dtype=float)
+    angles_deg = np.asarray(angles_deg, dtype=float)
+    if np.any(np.diff(gaps_mm) <= 0) or np.any(np.diff(angles_deg) <= 0):
+        raise ValueError("Table axes must be strictly increasing")
+    if gap_spacing not in GAP_SPACINGS:
+        raise ValueError(f"Unknown gap spacing: {gap_spacing}")
+    if gap_spacing == 'geometric' and gaps_mm[0] <= 0:
+        raise ValueError("A geometric gap axis must start above 0 mm")
+
+    grid = magnet_grid.make_grid(gaps_mm, angles_deg, meshings=[meshing])
+    magnet_grid.run_grid(grid, layout, workers)
+
+    overlap = grid['overlap'].reshape(len(gaps_mm), len(angles_deg))
+    ft = np.stack((grid['force'], grid['torque']), axis=1).reshape(len(gaps_mm), len(angles_deg), 2, 3)
+    ft[overlap] = np.nan
+    np.save(path, np.stack([sign * ft for sign in SIGNS]))
+
+    axes = {
+        'layout': layout,
+        'meshing': int(meshing),
+        'signs': list(SIGNS),
+        'gap_spacing': gap_spacing,
+        'gaps_mm': gaps_mm.tolist(),
+        'angles_deg': angles_deg.tolist(),
+        'overlap': overlap.tolist(),
+    }
+    with open(sidecar_path(path), 'w') as f:
+        json.dump(axes, f, indent=2)
+    return axes
+
+def _interval(axis, values):
+    """Lower grid index and interpolation weight for each value, clamped to the axis"""
+    values = np.clip(values, axis[0], axis[-1])
+    index = np.clip(np.searchsorted(axis, values, side='right') - 1, 0, len(axis) - 2)
+    weight = (values - axis[index]) / (axis[index + 1] - axis[index])
+    return index, weight
+
+class LookupTable:
+    """Bilinear interpolation over a table written by build_table"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(sidecar_path(path)) as f:
+            self.axes = json.load(f)
+        self.gaps_mm = np.array(self.axes['gaps_mm'])
+        self.angles_deg = np.array(self.axes['angles_deg'])
+        # Tables written before the gap spacing was recorded are linear
+        self.log_gaps = self.axes.get('gap_spacing', 'linear') == 'geometric'
+        self._gap_axis = np.log(self.gaps_mm) if self.log_gaps else self.gaps_mm
+        # Tables written before overlaps were checked have no mask
+        self.overlap = np.array(self.axes.get('overlap', np.zeros((len(self.gaps_mm), len(self.angles_deg)), bool)))
+        self._table = None
+
+    @property
+    def table(self):
+        """The (sign, gap, angle, 2, 3) array, memory mapped on first use"""
+        if self._table is None:
+            self._table = np.load(self.path, mmap_mode='r')
+        return self._table
+
+    def in_range(self, gaps_mm, angles_deg):
+        """True where a query lies inside the table (outside it is clamped to the edge)
+
+        Inside the table a query can still touch an overlapping grid point;
+        see overlapping.
+        """
+        gaps_mm, angles_deg = np.asarray(gaps_mm), np.asarray(angles_deg)
+        return ((gaps_mm >= self.gaps_mm[0]) & (gaps_mm <= self.gaps_mm[-1]) &
+                (angles_deg >= self.angles_deg[0]) & (angles_deg <= self.angles_deg[-1]))
+
+    def _cells(self, gaps_mm, angles_deg):
+        """Flattened queries, and the lower grid indices and weights of their cells"""
+        gaps_mm, angles_deg = np.broadcast_arrays(np.atleast_1d(np.asarray(gaps_mm, dtype=float)),
+                                                  np.atleast_1d(np.asarray(angles_deg, dtype=float)))
+        gaps_mm, angles_deg = gaps_mm.ravel(), angles_deg.ravel()
+        i, u = _interval(self._gap_axis, np.log(np.maximum(gaps_mm, self.gaps_mm[0])) if self.log_gaps else gaps_mm)
+        j, v = _interval(self.angles_deg, angles_deg)
+        return i, u, j, v
+
+    def overlapping(self, gaps_mm, angles_deg):
+        """True where a query interpolates from a grid point whose magnets intersect (query gives NaN)"""
+        i, u, j, v = self._cells(gaps_mm, angles_deg)
+        # Corners with zero weight do not contribute, so queries on a clean edge stay usable
+        return ((self.overlap[i, j] & (u < 1) & (v < 1)) | (self.overlap[i + 1, j] & (u > 0) & (v < 1)) |
+                (self.overlap[i, j + 1] & (u < 1) & (v > 0)) | (self.overlap[i + 1, j + 1] & (u > 0) & (v > 0)))
+
+    def query(self, gaps_mm, angles_deg, signs=1):
+        """Force and torque (n, 2, 3) for each gap/angle/sign; sign 0 (magnet off) gives zeros
+
+        Queries that touch an overlapping grid point give NaN.
+        """
+        gaps_mm, angles_deg, signs = np.broadcast_arrays(np.atleast_1d(np.asarray(gaps_mm, dtype=float)),
+                                                         np.atleast_1d(np.asarray(angles_deg, dtype=float)),
+                                                         np.atleast_1d(np.asarray(signs)))
+        signs = signs.ravel()
+        i, u, j, v = self._cells(gaps_mm, angles_deg)
+        s = (signs > 0).astype(np.intp)
+        u = u[:, None, None]
+        v = v[:, None, None]
+
+        table = self.table
+        corners = [((1 - u) * (1 - v), table[s, i, j]), (u * (1 - v), table[s, i + 1, j]),
+                   ((1 - u) * v, table[s, i, j + 1]), (u * v, table[s, i + 1, j + 1])]
+        # Skip zero-weight corners so a NaN (overlapping) neighbour does not spoil an exact edge
+        result = sum(np.where(weight > 0, weight * corner, 0.0) for weight, corner in corners)
+        result[signs == 0] = 0.0
+        return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query a precomputed face magnet force/torque table")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help="Evaluate the grid and write the table")
+    build.add_argument('output', help="Table .npy path (a .json sidecar is written next to it)")
+    build.add_argument('--layout', choices=['centered', 'hinged'], default='centered')
+    build.add_argument('--gap', nargs=3, type=float, default=[0.5, 20, 40], metavar=('START', 'STOP', 'NUM'),
+                       help="Gap axis in mm (default: 0.5 20 40)")
+    build.add_argument('--gap-spacing', choices=GAP_SPACINGS, default='geometric',
+                       help="Spacing of the gap axis (default: geometric, denser at small gaps)")
+    build.add_argument('--angle', nargs=3, type=float, default=[0, 60, 61], metavar=('START', 'STOP', 'NUM'),
+                       help="Angle axis in degrees (default: 0 60 61)")
+    build.add_argument('--meshing', type=int, help="Target mesh element count (default: the scripts' 5x5x5)")
+    build.add_argument('--workers', type=int, help="Worker processes (default: every core)")
+
+    query = subparsers.add_parser('query', help="Interpolate one configuration")
+    query.add_argument('table', help="Table .npy path")
+    query.add_argument('gap_mm', type=float)
+    query.add_argument('angle_deg', type=float)
+    query.add_argument('--sign', type=int, choices=[-1, 0, 1], default=1)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        try:
+            gaps_mm = gap_axis(args.gap[0], args.gap[1], int(args.gap[2]), args.gap_spacing)
+        except ValueError as e:
+            parser.error(str(e))
+        angles_deg = np.linspace(args.angle[0], args.angle[1], int(args.angle[2]))
+        start = time.perf_counter()
+        build_table(args.output, gaps_mm, angles_deg, args.layout, args.meshing, args.workers, args.gap_spacing)
+        print(f"Wrote {args.output} ({len(gaps_mm)} gaps x {len(angles_deg)} angles) in {time.perf_counter() - start:.1f}s")
+        return
+
+    table = LookupTable(args.table)
+    force_N, torque_Nm = table.query(args.gap_mm, args.angle_deg, args.sign)[0]
+    if not table.in_range(args.gap_mm, args.angle_deg):
+        print("Warning: query is outside the table and was clamped to its edge")
+    if table.overlapping(args.gap_mm, args.angle_deg)[0]:
+        print("Warning: query is next to configurations whose magnets overlap, so it has no value")
+    print(f"Force vector (Fx, Fy, Fz):  ({force_N[0]:.4f}, {force_N[1]:.4f}, {force_N[2]:.4f}) Newtons")
+    print(f"Torque vector (Tx, Ty, Tz): ({torque_Nm[0]:.4f}, {torque_Nm[1]:.4f}, {torque_Nm[2]:.4f}) Newton-meters")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Net force and torque on every tile of a dodecagon tiling
+
+Tiles form the 3.12.12 tiling: regular dodecagons whose centres sit on a
+triangular lattice, neighbours sharing an edge, with triangles filling
+the gaps. Every dodecagon carries one cylindrical magnet per face with
+its axis along the outward face normal, set back so that the magnets of
+two tiles sharing an edge are face_gap_mm apart. Face 0 faces +x, and
+even faces face the neighbouring dodecagons while odd faces face the
+triangles.
+
+Only magnet pairs on different tiles closer than cutoff_m interact; a
+KD-tree finds them without visiting all O(N^2) pairs. Forces inside a
+tile cancel, so same-tile pairs are skipped. Pairs whose dipole error
+estimate is within dipole_tolerance use the closed-form dipole, and the
+rest use the meshed model. The tiling repeats the same near-field
+geometry many times, so each distinct relative pose is meshed only once.
+Each pair is evaluated once. The other magnet gets the reaction (equal
+and opposite force and torque about the same point), which matches
+evaluating it directly up to the mesh discretization error.
+"""
+import argparse
+import time
+
+import numpy as np
+import magpylib as magpy
+from scipy.spatial import cKDTree
+from scipy.spatial.transform import Rotation as R
+
+import magnet_dipole
+import magnet_model
+
+FACES = 12
+
+def apothem(side_m):
+    """Centre to face distance of a regular dodecagon"""
+    return side_m / 2 / np.tan(np.pi / FACES)
+
+def tile_centers(rows, cols, side_m):
+    """Centres (rows * cols, 3) of a rows x cols patch of the triangular lattice"""
+    spacing = 2 * apothem(side_m)
+    row, col = np.meshgrid(np.arange(rows), np.arange(cols), indexing='ij')
+    x = spacing * (col + 0.5 * (row % 2))
+    y = spacing * row * np.sqrt(3) / 2
+    return np.column_stack((x.ravel(), y.ravel(), np.zeros(x.size)))
+
+def magnet_poses(centers, side_m, face_gap_mm=1.0, length_m=magnet_model.CYLINDER_LENGTH_M):
+    """Positions (n_tiles * 12, 3) and orientations of every face magnet, tile by tile"""
+    normal_deg = np.arange(FACES) * 360.0 / FACES
+    # Tip the cylinder axis from +Z into the plane, then turn it to the face normal
+    face_rotations = R.from_euler('z', normal_deg[:, None], degrees=True) * R.from_euler('y', 90, degrees=True)
+    normals = face_rotations.apply([0, 0, 1])
+
+    distance = apothem(side_m) - face_gap_mm / 2000 - length_m / 2
+    if distance < 0:
+        raise ValueError("Magnets do not fit inside the tile")
+
+    positions = (centers[:, None, :] + distance * normals[None, :, :]).reshape(-1, 3)
+    quats = np.tile(face_rotations.as_quat(), (len(centers), 1))
+    return positions, R.from_quat(quats)
+
+def _relative_poses(positions, rotation, sources, targets):
+    """Target position and orientation in each source magnet's frame"""
+    inverse = rotation[sources].inv()
+    return inverse.apply(positions[targets] - positions[sources]), inverse * rotation[targets]
+
+def pair_ft(positions, rotation, sources, targets, dipole_tolerance=0.05, diameter_m=magnet_model.CYLINDER_DIAMETER_M,
+            length_m=magnet_model.CYLINDER_LENGTH_M, pol_T=magnet_model.MAGNET_POL_T, meshing=magnet_model.MESHING):
+    """Force on each target magnet from its source, and torque about the source centre, in world axes
+
+    Both magnets are taken as polarized +pol_T along their own axes.
+    Returns (ft, exact), where exact marks the pairs that were meshed.
+    """
+    volume = magnet_dipole.cylinder_volume(diameter_m, length_m)
+    radius = magnet_dipole.cylinder_radius(diameter_m, length_m)
+    separation = np.linalg.norm(positions[targets] - positions[sources], axis=1)
+    exact = magnet_dipole.dipole_error(separation, radius, radius) > dipole_tolerance
+
+    moments = magnet_dipole.dipole_moments(np.full(len(positions), pol_T), rotation, volume)
+    ft = magnet_dipole.dipole_ft(moments[sources], positions[sources], moments[targets], positions[targets],
+                                 anchor=(0, 0, 0))
+    # Move the dipole torque from the origin to the source centre, like the meshed path below
+    ft[:, 1] -= np.cross(positions[sources], ft[:, 0])
+
+    if np.any(exact):
+        near = np.nonzero(exact)[0]
+        relative_positions, relative_rotation = _relative_poses(positions, rotation, sources[near], targets[near])
+
+        # Repeated geometry (the same face pairing on every tile) is evaluated once
+        pose_keys = np.round(np.hstack((relative_positions, relative_rotation.as_matrix().reshape(-1, 9))), 9)
+        _, unique_index, inverse = np.unique(pose_keys, axis=0, return_index=True, return_inverse=True)
+
+        source = magnet_model.make_source(diameter_m, length_m, pol_T)
+        target = magpy.magnet.Cylinder(polarization=(0, 0, pol_T), dimension=(diameter_m, length_m),
+                                      position=relative_positions[unique_index],
+                                      orientation=relative_rotation[unique_index])
+        target.meshing = meshing
+        local = magnet_model.path_ft(source, target, anchor=(0, 0, 0))[inverse.ravel()]
+
+        source_rotation = rotation[sources[near]]
+        ft[near, 0] = source_rotation.apply(local[:, 0])
+        ft[near, 1] = source_rotation.apply(local[:, 1])
+
+    return ft, exact
+
+def tile_ft(centers, states, side_m, face_gap_mm=1.0, cutoff_m=0.2, dipole_tolerance=0.05, **kwargs):
+    """Net force (n_tiles, 3) and torque about each tile centre (n_tiles, 3)
+
+    states is (n_tiles, 12) with -1, 0 or +1 per face magnet: reversed,
+    off or polarized outward. Returns (force, torque, stats).
+    """
+    centers = np.asarray(centers, dtype=float)
+    states = np.asarray(states).reshape(-1)
+    n_tiles = len(centers)
+    positions, rotation = magnet_poses(centers, side_m, face_gap_mm, kwargs.get('length_m', magnet_model.CYLINDER_LENGTH_M))
+    tiles = np.repeat(np.arange(n_tiles), FACES)
+
+    # Only energized magnets take part; the tree finds every pair within the cutoff
+    active = np.nonzero(states != 0)[0]
+    pairs = cKDTree(positions[active]).query_pairs(cutoff_m, output_type='ndarray')
+    sources, targets = active[pairs[:, 0]], active[pairs[:, 1]]
+    different = tiles[sources] != tiles[targets]
+    sources, targets = sources[different], targets[different]
+
+    ft, exact = pair_ft(positions, rotation, sources, targets, dipole_tolerance, **kwargs)
+    ft *= (states[sources] * states[targets])[:, None, None]  # Linear in each magnet's polarization
+
+    # The source feels the opposite force, and the opposite torque about the same point
+    force = np.zeros((n_tiles, 3))
+    torque = np.zeros((n_tiles, 3))
+    np.add.at(force, tiles[targets], ft[:, 0])
+    np.add.at(force, tiles[sources], -ft[:, 0])
+    np.add.at(torque, tiles[targets], ft[:, 1] + np.cross(positions[sources] - centers[tiles[targets]], ft[:, 0]))
+    np.add.at(torque, tiles[sources], -ft[:, 1] - np.cross(positions[sources] - centers[tiles[sources]], ft[:, 0]))
+
+    stats = {
+        'tiles': n_tiles,
+        'magnets': len(active),
+        'all_pairs': len(active) * (len(active) - 1) // 2,
+        'pairs_in_cutoff': len(sources),
+        'meshed_pairs': int(np.count_nonzero(exact)),
+        'dipole_pairs': int(np.count_nonzero(~exact)),
+    }
+    return force, torque, stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Net force and torque on every tile of a dodecagon tiling")
+    parser.add_argument('--rows', type=int, default=10)
+    parser.add_argument('--cols', type=int, default=10)
+    parser.add_argument('--side', type=float, default=0.03, help="Dodecagon side length in m (default: 0.03)")
+    parser.add_argument('--face-gap', type=float, default=1.0, help="Gap between facing magnets in mm (default: 1)")
+    parser.add_argument('--cutoff', type=float, default=0.2, help="Interaction cutoff in m (default: 0.2)")
+    parser.add_argument('--dipole-tolerance', type=float, default=0.05,
+                        help="Largest estimated dipole error accepted before meshing a pair (default: 0.05)")
+    parser.add_argument('--states', choices=['outward', 'alternating', 'random'], default='alternating',
+                        help="Face magnet polarizations (alternating: +1/-1 around each tile)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    centers = tile_centers(args.rows, args.cols, args.side)
+    if args.states == 'outward':
+        states = np.ones((len(centers), FACES), dtype=int)
+    elif args.states == 'alternating':
+        states = np.tile(np.where(np.arange(FACES) % 2 == 0, 1, -1), (len(centers), 1))
+    else:
+        states = np.random.default_rng(args.seed).integers(-1, 2, size=(len(centers), FACES))
+
+    start = time.perf_counter()
+    force, torque, stats = tile_ft(centers, states, args.side, args.face_gap, args.cutoff, args.dipole_tolerance)
+    elapsed = time.perf_counter() - start
+
+    print(f"{stats['tiles']} tiles, {stats['magnets']} energized magnets")
+    print(f"Pairs: {stats['pairs_in_cutoff']} within {args.cutoff}m of {stats['all_pairs']} "
+          f"({stats['meshed_pairs']} meshed, {stats['dipole_pairs']} dipole) in {elapsed:.2f}s")
+
+    print(f"\n{'Tile':<6} {'Fx(N)':>9} {'Fy(N)':>9} {'Fz(N)':>9} {'Tz(N*m)':>10}")
+    for index in np.argsort(-np.linalg.norm(force, axis=1))[:10]:
+        print(f"{index:<6} {force[index, 0]:>9.4f} {force[index, 1]:>9.4f} {force[index, 2]:>9.4f} {torque[index, 2]:>10.5f}")
+
+if __name__ == "__main__":
+    main()
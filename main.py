@@ -1,9 +1,30 @@
+import argparse
+import collections
 import serial
 import serial.tools.list_ports
 import time
 import threading
-import statistics
-import hashlib
+import queue
+
+from framing import FrameBuffer, OVERHEAD, make_test_frame, payload_size
+from histogram import LatencyHistogram
+from instrumentation import Instrumentation, JsonlSink, ProgressReporter
+from search import AdaptiveSearch
+from simulator import SimulatedArduino
+
+# Common Arduino identifiers in port descriptions and manufacturers
+ARDUINO_KEYWORDS = ['arduino', 'ch340', 'ch341', 'ftdi', 'usb serial']
+
+def is_arduino_port(port):
+    """Check whether a list_ports entry looks like an Arduino"""
+    desc = (port.description or "").lower()
+    mfg = (port.manufacturer or "").lower()
+    
+    return any(keyword in desc or keyword in mfg for keyword in ARDUINO_KEYWORDS)
+
+def find_arduinos():
+    """Find every port that looks like an Arduino"""
+    return [port.device for port in serial.tools.list_ports.comports() if is_arduino_port(port)]
 
 def find_arduino():
     """Find Arduino port automatically"""
@@ -13,14 +34,8 @@ def find_arduino():
     for port in ports:
         print(f"  {port.device}: {port.description}")
     
-    # Look for common Arduino identifiers
-    arduino_keywords = ['arduino', 'ch340', 'ch341', 'ftdi', 'usb serial']
-    
     for port in ports:
-        desc = (port.description or "").lower()
-        mfg = (port.manufacturer or "").lower()
-        
-        if any(keyword in desc or keyword in mfg for keyword in arduino_keywords):
+        if is_arduino_port(port):
             print(f"Found Arduino: {port.device}")
             return port.device
     
@@ -31,87 +46,174 @@ def find_arduino():
     
     return None
 
+def open_connection(port, baudrate, timeout=0.1):
+    """Open a serial port, or the simulated device for sim:// ports"""
+    if port.startswith("sim://"):
+        return SimulatedArduino.from_url(port, baudrate=baudrate, timeout=timeout)
+    
+    connection = serial.Serial(port, baudrate, timeout=timeout)
+    time.sleep(2)  # Give Arduino time to initialize
+    return connection
+
+class SerialReader:
+    """Background reader that timestamps serial data as it arrives
+
+    Each chunk goes to _handle on the reader thread; subclasses override
+    it to process data there instead of queueing it for get().
+    """
+    
+    def __init__(self, connection):
+        self.connection = connection
+        self.chunks = queue.Queue()
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start the reader thread"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{type(self).__name__}({self.connection.port})", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop the reader thread and wait for it to exit"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                # Blocks until at least one byte arrives or the port timeout expires
+                data = self.connection.read(1)
+                if not data:
+                    continue
+                if self.connection.in_waiting > 0:
+                    data += self.connection.read(self.connection.in_waiting)
+            except (serial.SerialException, OSError, TypeError):
+                # Port closed underneath us
+                break
+            
+            self._handle(time.perf_counter_ns(), data)
+    
+    def _handle(self, arrival_ns, data):
+        self.chunks.put((arrival_ns, data))
+    
+    def get(self, timeout):
+        """Return the next (arrival_ns, data) chunk, or None after timeout seconds"""
+        try:
+            return self.chunks.get(timeout=max(timeout, 0))
+        except queue.Empty:
+            return None
+    
+    def clear(self):
+        """Discard everything received so far and return the number of bytes dropped"""
+        dropped = 0
+        while True:
+            try:
+                dropped += len(self.chunks.get_nowait()[1])
+            except queue.Empty:
+                return dropped
+
+# Latency percentiles reported for every test (result key prefix, percent)
+PERCENTILES = [('p50', 50), ('p90', 90), ('p99', 99), ('p999', 99.9)]
+
+# Failure messages kept per test; everything else is counted, so soak runs use fixed memory
+MAX_RECORDED_FAILURES = 100
+
 class PacketOptimizer:
-    def __init__(self, port):
+    # Grid swept by run_optimization
+    PACKET_SIZES = list(range(63, 64))
+    DELAYS_MS = [0, 1, 2, 3, 5, 10, 15, 25, 33, 47, 56]  # Different delays between packets
+    PACKETS_PER_TEST = 256
+    
+    # Target rates ramped by run_streaming_test (2M baud carries at most 200,000 bytes/sec)
+    STREAM_RATES_BPS = [5000, 10000, 20000, 40000, 60000, 80000, 120000, 160000, 200000]
+    
+    def __init__(self, port, verbose=True, progress=False, sink=None, stop_event=None, log_prefix=""):
         self.port = port
+        self.verbose = verbose  # Print a line for every packet
+        self.progress = progress  # Print aggregated progress instead (when not verbose)
+        self.sink = sink  # Optional JsonlSink receiving every test result
+        self.stop_event = stop_event or threading.Event()  # Set from another thread to end the tests early
+        self.log_prefix = log_prefix  # Label for summary lines when several tables share the console
         self.arduino = None
+        self.reader = None
+        self.receive_buffer = FrameBuffer()
         self.BAUD_RATE = 2000000  # Fixed at 2M baud as specified
         
         # Test results
         self.test_results = {}
         
+    def log(self, message=""):
+        """Print a summary line (or several), each starting with log_prefix"""
+        print('\n'.join(self.log_prefix + line for line in message.split('\n')))
+    
     def connect(self):
         """Connect to Arduino at 2M baud"""
         try:
-            if self.arduino and self.arduino.is_open:
-                self.arduino.close()
+            self.disconnect()
             
-            self.arduino = serial.Serial(self.port, self.BAUD_RATE, timeout=1.0)
-            time.sleep(2)  # Give Arduino time to initialize
+            # Short timeout so the reader thread notices when it is stopped
+            self.arduino = open_connection(self.port, self.BAUD_RATE, timeout=0.1)
             
             # Clear any initial data
             if self.arduino.in_waiting > 0:
                 self.arduino.read(self.arduino.in_waiting)
             
-            print(f"Connected to {self.port} at {self.BAUD_RATE:,} baud")
+            self.reader = SerialReader(self.arduino)
+            self.reader.start()
+            
+            self.log(f"Connected to {self.port} at {self.BAUD_RATE:,} baud")
             return True
         except Exception as e:
-            print(f"Failed to connect: {e}")
+            self.log(f"Failed to connect: {e}")
             return False
     
+    def disconnect(self):
+        """Stop the reader thread and close the port"""
+        if self.reader:
+            self.reader.stop()
+            self.reader = None
+        if self.arduino and self.arduino.is_open:
+            self.arduino.close()
+    
     def create_test_packet(self, size, packet_id):
-        """Create a test packet with verification data"""
-        if size < 10:
-            size = 10  # Minimum size for packet ID and basic data
-        
-        # Format: [ID:4chars][DATA][CHECKSUM:4chars]\n
-        header = f"{packet_id:04d}"
-        
-        # Calculate how much data we need (total - header - checksum - newline)
-        data_size = size - 4 - 4 - 1  # 4 for ID, 4 for checksum, 1 for newline
-        if data_size < 1:
-            data_size = 1
+        """Create a binary test frame with verification data"""
+        if size < OVERHEAD + 1:
+            size = OVERHEAD + 1  # Minimum size for frame header, CRC and one payload byte
         
-        # Create predictable data pattern
-        data = ''.join([chr(65 + (i % 26)) for i in range(data_size)])  # A-Z pattern
-        
-        # Create checksum of header + data
-        content = header + data
-        checksum = hashlib.md5(content.encode()).hexdigest()[:4].upper()
-        
-        packet = f"{header}{data}{checksum}\n"
-        return packet
+        # Format: [LENGTH:u16][SEQUENCE:u32][PAYLOAD][CRC32:u32]
+        return make_test_frame(size, packet_id)
     
     def verify_packet(self, sent_packet, received_packet):
-        """Verify received packet matches sent packet"""
-        sent_clean = sent_packet.strip()
-        received_clean = received_packet.strip()
+        """Verify received frame matches sent frame"""
+        if not received_packet:
+            return False, "No response"
         
-        if sent_clean == received_clean:
+        if sent_packet == received_packet:
             return True, "Perfect match"
         
-        if len(received_clean) == 0:
-            return False, "No response"
-        
-        if len(received_clean) != len(sent_clean):
-            return False, f"Length mismatch: sent {len(sent_clean)}, got {len(received_clean)}"
+        if len(received_packet) != len(sent_packet):
+            return False, f"Length mismatch: sent {len(sent_packet)}, got {len(received_packet)}"
         
         # Check for partial corruption
-        differences = sum(1 for a, b in zip(sent_clean, received_clean) if a != b)
-        corruption_pct = (differences / len(sent_clean)) * 100
+        differences = sum(1 for a, b in zip(sent_packet, received_packet) if a != b)
+        corruption_pct = (differences / len(sent_packet)) * 100
         
-        return False, f"{differences} corrupted chars ({corruption_pct:.1f}%)"
+        return False, f"{differences} corrupted bytes ({corruption_pct:.1f}%)"
     
     def test_packet_size(self, packet_size, num_packets=50, delay_between_ms=0):
         """Test specific packet size with timing and verification"""
-        print(f"\nTesting {packet_size}-byte packets (delay: {delay_between_ms}ms)...")
+        self.log(f"\nTesting {packet_size}-byte packets (delay: {delay_between_ms}ms)...")
         
         results = {
             'packet_size': packet_size,
             'num_packets': num_packets,
             'delay_ms': delay_between_ms,
-            'round_trip_times': [],
-            'verification_results': [],
+            'latency_histogram': LatencyHistogram(),
+            'verified_count': 0,
+            'recent_failures': collections.deque(maxlen=MAX_RECORDED_FAILURES),
             'success_count': 0,
             'total_bytes_sent': 0,
             'total_bytes_received': 0,
@@ -119,132 +221,543 @@ class PacketOptimizer:
             'timeout_count': 0,
             'partial_count': 0
         }
+        instrumentation = results['instrumentation'] = Instrumentation()
+        progress = ProgressReporter(num_packets) if self.progress and not self.verbose else None
         
         for packet_id in range(num_packets):
+            if self.stop_event.is_set():
+                break
             try:
                 # Clear buffer before test
-                if self.arduino.in_waiting > 0:
-                    junk = self.arduino.read(self.arduino.in_waiting)
-                    if len(junk) > 0:
-                        print(f"  Cleared {len(junk)} bytes of leftover data")
+                junk = self.reader.clear() + len(self.receive_buffer)
+                self.receive_buffer.clear()
+                if junk > 0:
+                    instrumentation.count('leftover_bytes', junk)
+                    if self.verbose:
+                        print(f"  Cleared {junk} bytes of leftover data")
                 
                 # Create test packet
+                lap_ns = time.perf_counter_ns()
                 test_packet = self.create_test_packet(packet_size, packet_id)
                 
-                # Send packet and measure timing
-                start_time = time.time()
-                self.arduino.write(test_packet.encode())
+                # Send packet and measure timing; inside the round trip only raw stamps are
+                # taken, and they are charged to their stages once it is over
+                start_ns = instrumentation.lap('create', lap_ns)
+                self.arduino.write(test_packet)
+                write_ns = time.perf_counter_ns()
                 self.arduino.flush()
+                lap_ns = time.perf_counter_ns()
+                stamps = [('write', write_ns), ('flush', lap_ns)]
                 
                 results['total_bytes_sent'] += len(test_packet)
                 
-                # Wait for complete echo with timeout
-                received_data = ""
-                timeout_start = time.time()
-                expected_length = len(test_packet)
+                # Wait for the echoed frame with timeout; the reader stamps each chunk on arrival
+                received_packet = None
+                deadline_ns = start_ns + 3_000_000_000
+                end_ns = None
                 
-                while len(received_data) < expected_length and (time.time() - timeout_start) < 3.0:
-                    if self.arduino.in_waiting > 0:
-                        chunk = self.arduino.read(self.arduino.in_waiting).decode('utf-8', errors='ignore')
-                        received_data += chunk
-                    else:
-                        time.sleep(0.01)  # Small delay if no data available
+                while received_packet is None:
+                    chunk = self.reader.get((deadline_ns - lap_ns) / 1e9)
+                    stamps.append(('wait', time.perf_counter_ns()))
+                    if chunk is None:
+                        break
+                    end_ns, data = chunk
+                    results['total_bytes_received'] += len(data)
+                    self.receive_buffer.write(data)
+                    stamps.append(('read', time.perf_counter_ns()))
+                    
+                    while True:
+                        frame = self.receive_buffer.next_frame(lambda sequence, length: sequence == packet_id)
+                        if frame is None or frame[0] == packet_id:
+                            break
+                    if frame is not None:
+                        received_packet = frame[1]
+                    lap_ns = time.perf_counter_ns()
+                    stamps.append(('decode', lap_ns))
                 
-                end_time = time.time()
-                round_trip_ms = (end_time - start_time) * 1000
-                results['round_trip_times'].append(round_trip_ms)
-                results['total_bytes_received'] += len(received_data)
+                if received_packet is None:
+                    end_ns = time.perf_counter_ns()
+                round_trip_ms = (end_ns - start_ns) / 1e6
+                results['latency_histogram'].record(end_ns - start_ns)
+                instrumentation.replay(start_ns, stamps)
+                instrumentation.count('chunks', sum(1 for stage, _ in stamps if stage == 'read'))
+                lap_ns = time.perf_counter_ns()
                 
                 # Verify the packet
-                is_valid, error_msg = self.verify_packet(test_packet, received_data)
-                results['verification_results'].append((is_valid, error_msg))
+                is_valid, error_msg = self.verify_packet(test_packet, received_packet)
+                status = self.record_verification(results, packet_id, is_valid, error_msg)
+                lap_ns = instrumentation.lap('verify', lap_ns)
                 
-                if is_valid:
-                    results['success_count'] += 1
-                    status = "✓"
-                elif "timeout" in error_msg.lower() or "no response" in error_msg.lower():
-                    results['timeout_count'] += 1
-                    status = "T"
-                elif "length mismatch" in error_msg.lower():
-                    results['partial_count'] += 1
-                    status = "P"
-                else:
-                    results['corruption_count'] += 1
-                    status = "C"
-                
-                print(f"  Packet {packet_id+1:3d}: {status} {round_trip_ms:6.1f}ms - {error_msg}")
+                if self.verbose:
+                    print(f"  Packet {packet_id+1:3d}: {status} {round_trip_ms:8.3f}ms - {error_msg}")
+                elif progress:
+                    progress.update(results, packet_id + 1)
+                lap_ns = instrumentation.lap('report', lap_ns)
                 
                 # Optional delay between packets
                 if delay_between_ms > 0:
                     time.sleep(delay_between_ms / 1000.0)
+                    instrumentation.lap('delay', lap_ns)
                 
             except Exception as e:
-                print(f"  Packet {packet_id+1:3d}: ✗ Exception: {e}")
-                results['verification_results'].append((False, f"Exception: {e}"))
-        
-        # Calculate statistics
-        if results['round_trip_times']:
-            results['avg_round_trip_ms'] = statistics.mean(results['round_trip_times'])
-            results['min_round_trip_ms'] = min(results['round_trip_times'])
-            results['max_round_trip_ms'] = max(results['round_trip_times'])
-            results['stddev_round_trip_ms'] = statistics.stdev(results['round_trip_times']) if len(results['round_trip_times']) > 1 else 0
+                self.log(f"  Packet {packet_id+1:3d}: ✗ Exception: {e}")
+                results['verified_count'] += 1
+                results['recent_failures'].append((packet_id, f"Exception: {e}"))
+        
+        if progress:
+            progress.update(results, num_packets, force=True)
+        self.calculate_statistics(results)
+        results['measured_time_s'] = results['latency_histogram'].total_ns / 1e9
+        results['effective_throughput_bps'] = (results['total_bytes_sent'] * 2) / results['measured_time_s'] if results['measured_time_s'] > 0 else 0
+        
+        # Print summary for this packet size
+        self.log(f"  Results: {results['success_rate']:.1f}% success, {results['avg_round_trip_ms']:.3f}ms avg")
+        self.log(f"    Latency p50/p90/p99/p99.9: {results['p50_round_trip_ms']:.3f}/{results['p90_round_trip_ms']:.3f}/{results['p99_round_trip_ms']:.3f}/{results['p999_round_trip_ms']:.3f}ms")
+        self.log(f"    Timeouts: {results['timeout_count']}, Partial: {results['partial_count']}, Corrupted: {results['corruption_count']}")
+        self.log(f"    Effective throughput: {results['effective_throughput_bps']:.0f} bytes/sec")
+        self.report_instrumentation(results)
+        
+        return results
+    
+    def report_instrumentation(self, results):
+        """Print the per-stage time breakdown and send the result to the sink"""
+        if self.verbose:
+            results['instrumentation'].print_breakdown()
+        if self.sink:
+            self.sink.write(results, port=self.port, kind='packet_test')
+    
+    def record_verification(self, results, sequence, is_valid, error_msg):
+        """Tally a verification result and return its status character"""
+        results['verified_count'] += 1
+        if is_valid:
+            results['success_count'] += 1
+            return "✓"
+        
+        results['recent_failures'].append((sequence, error_msg))
+        if "timeout" in error_msg.lower() or "no response" in error_msg.lower():
+            results['timeout_count'] += 1
+            return "T"
+        if "length mismatch" in error_msg.lower():
+            results['partial_count'] += 1
+            return "P"
+        results['corruption_count'] += 1
+        return "C"
+    
+    def calculate_statistics(self, results):
+        """Fill in round trip statistics and success rate"""
+        histogram = results['latency_histogram']
+        if histogram.count:
+            results['avg_round_trip_ms'] = histogram.mean() / 1e6
+            results['min_round_trip_ms'] = histogram.min_ns / 1e6
+            results['max_round_trip_ms'] = histogram.max_ns / 1e6
+            results['stddev_round_trip_ms'] = histogram.stdev() / 1e6
         else:
             results['avg_round_trip_ms'] = 0
             results['min_round_trip_ms'] = 0
             results['max_round_trip_ms'] = 0
             results['stddev_round_trip_ms'] = 0
         
-        results['success_rate'] = (results['success_count'] / num_packets) * 100
-        results['effective_throughput_bps'] = (results['total_bytes_sent'] * 2) / (sum(results['round_trip_times']) / 1000) if results['round_trip_times'] else 0
+        for name, percent in PERCENTILES:
+            results[f'{name}_round_trip_ms'] = histogram.percentile(percent) / 1e6
+        
+        results['success_rate'] = (results['success_count'] / results['num_packets']) * 100
+    
+    def test_packet_size_pipelined(self, packet_size, num_packets=50, delay_between_ms=0, window_size=4):
+        """Test specific packet size with up to window_size packets in flight"""
+        self.log(f"\nTesting {packet_size}-byte packets (delay: {delay_between_ms}ms, window: {window_size})...")
+        
+        results = {
+            'packet_size': packet_size,
+            'num_packets': num_packets,
+            'delay_ms': delay_between_ms,
+            'window_size': window_size,
+            'latency_histogram': LatencyHistogram(),
+            'verified_count': 0,
+            'recent_failures': collections.deque(maxlen=MAX_RECORDED_FAILURES),
+            'success_count': 0,
+            'total_bytes_sent': 0,
+            'total_bytes_received': 0,
+            'corruption_count': 0,
+            'timeout_count': 0,
+            'partial_count': 0,
+            'unmatched_count': 0
+        }
+        instrumentation = results['instrumentation'] = Instrumentation()
+        progress = ProgressReporter(num_packets) if self.progress and not self.verbose else None
+        
+        # Clear buffer before test
+        junk = self.reader.clear() + len(self.receive_buffer)
+        self.receive_buffer.clear()
+        if junk > 0:
+            instrumentation.count('leftover_bytes', junk)
+            if self.verbose:
+                print(f"  Cleared {junk} bytes of leftover data")
+        
+        timeout_ns = 3_000_000_000
+        delay_ns = int(delay_between_ms * 1_000_000)
+        in_flight = {}  # sequence number -> (frame, send time ns)
+        next_packet_id = 0
+        next_send_ns = 0
+        test_start_ns = time.perf_counter_ns()
+        last_echo_ns = test_start_ns
+        
+        while (next_packet_id < num_packets or in_flight) and not self.stop_event.is_set():
+            # Packets are in flight throughout, so only raw stamps are taken here and
+            # they are charged to their stages at the end of the iteration
+            stamps = []
+            sent_any = False
+            iteration_ns = lap_ns = time.perf_counter_ns()
+            while next_packet_id < num_packets and len(in_flight) < window_size and lap_ns >= next_send_ns:
+                # Keep the window full, honouring the delay between sends
+                test_packet = self.create_test_packet(packet_size, next_packet_id)
+                send_ns = time.perf_counter_ns()
+                in_flight[next_packet_id] = (test_packet, send_ns)
+                self.arduino.write(test_packet)
+                lap_ns = time.perf_counter_ns()
+                stamps += [('create', send_ns), ('write', lap_ns)]
+                results['total_bytes_sent'] += len(test_packet)
+                next_packet_id += 1
+                next_send_ns = send_ns + delay_ns
+                sent_any = True
+            
+            if sent_any:
+                self.arduino.flush()
+                lap_ns = time.perf_counter_ns()
+                stamps.append(('flush', lap_ns))
+            
+            # Sleep until data arrives, the next send is due, or the oldest packet times out
+            now_ns = lap_ns
+            wake_ns = now_ns + timeout_ns
+            if in_flight:
+                wake_ns = min(wake_ns, min(send_ns for _, send_ns in in_flight.values()) + timeout_ns)
+            if next_packet_id < num_packets and len(in_flight) < window_size:
+                wake_ns = min(wake_ns, next_send_ns)
+            
+            chunk = self.reader.get((wake_ns - now_ns) / 1e9)
+            stamps.append(('wait', time.perf_counter_ns()))
+            if chunk is not None:
+                arrival_ns, data = chunk
+                results['total_bytes_received'] += len(data)
+                self.receive_buffer.write(data)
+                stamps.append(('read', time.perf_counter_ns()))
+            
+            # Match every complete echo to its packet by the sequence number
+            while True:
+                frame = self.receive_buffer.next_frame(lambda sequence, length: sequence in in_flight,
+                                                       more_expected=len(in_flight) > 1)
+                stamps.append(('decode', time.perf_counter_ns()))
+                if frame is None:
+                    break
+                
+                sequence, received_packet, _ = frame
+                if sequence not in in_flight:
+                    results['unmatched_count'] += 1
+                    continue
+                
+                test_packet, send_ns = in_flight.pop(sequence)
+                round_trip_ms = (arrival_ns - send_ns) / 1e6
+                results['latency_histogram'].record(arrival_ns - send_ns)
+                last_echo_ns = arrival_ns
+                
+                is_valid, error_msg = self.verify_packet(test_packet, received_packet)
+                status = self.record_verification(results, sequence, is_valid, error_msg)
+                stamps.append(('verify', time.perf_counter_ns()))
+                if self.verbose:
+                    print(f"  Packet {sequence+1:3d}: {status} {round_trip_ms:8.3f}ms - {error_msg}")
+                    stamps.append(('report', time.perf_counter_ns()))
+            
+            # Expire packets whose echo never arrived
+            now_ns = time.perf_counter_ns()
+            for sequence, (test_packet, send_ns) in list(in_flight.items()):
+                if now_ns - send_ns >= timeout_ns:
+                    del in_flight[sequence]
+                    status = self.record_verification(results, sequence, False, "Timeout")
+                    if self.verbose:
+                        print(f"  Packet {sequence+1:3d}: {status} - Timeout")
+            
+            if progress:
+                progress.update(results, results['verified_count'])
+            
+            instrumentation.replay(iteration_ns, stamps)
+            if chunk is not None:
+                instrumentation.count('chunks')
+        
+        if progress:
+            progress.update(results, num_packets, force=True)
+        elapsed_s = (last_echo_ns - test_start_ns) / 1e9
+        results['measured_time_s'] = elapsed_s
+        
+        self.calculate_statistics(results)
+        results['effective_throughput_bps'] = (results['total_bytes_sent'] * 2) / elapsed_s if elapsed_s > 0 else 0
+        results['sustained_throughput_bps'] = (results['success_count'] * packet_size) / elapsed_s if elapsed_s > 0 else 0
         
         # Print summary for this packet size
-        print(f"  Results: {results['success_rate']:.1f}% success, {results['avg_round_trip_ms']:.1f}ms avg")
-        print(f"    Timeouts: {results['timeout_count']}, Partial: {results['partial_count']}, Corrupted: {results['corruption_count']}")
-        print(f"    Effective throughput: {results['effective_throughput_bps']:.0f} bytes/sec")
+        self.log(f"  Results: {results['success_rate']:.1f}% success, {results['avg_round_trip_ms']:.3f}ms avg latency")
+        self.log(f"    Latency p50/p90/p99/p99.9: {results['p50_round_trip_ms']:.3f}/{results['p90_round_trip_ms']:.3f}/{results['p99_round_trip_ms']:.3f}/{results['p999_round_trip_ms']:.3f}ms")
+        self.log(f"    Timeouts: {results['timeout_count']}, Partial: {results['partial_count']}, Corrupted: {results['corruption_count']}, Unmatched: {results['unmatched_count']}")
+        self.log(f"    Effective throughput: {results['effective_throughput_bps']:.0f} bytes/sec")
+        self.log(f"    Sustained echo throughput: {results['sustained_throughput_bps']:.0f} bytes/sec")
+        self.report_instrumentation(results)
         
         return results
     
-    def run_optimization(self):
-        """Run packet size optimization tests"""
+    def _stream_writer(self, packet_size, rate_bps, duration_s, send_times, done):
+        """Writer thread: send sequence-numbered frames at rate_bps for duration_s"""
+        interval_ns = packet_size / rate_bps * 1e9
+        start_ns = time.perf_counter_ns()
+        end_ns = start_ns + int(duration_s * 1e9)
+        next_ns = start_ns
+        sequence = 0
+        
+        try:
+            while True:
+                now_ns = time.perf_counter_ns()
+                if now_ns >= end_ns:
+                    break
+                if now_ns < next_ns:
+                    time.sleep((next_ns - now_ns) / 1e9)
+                    continue
+                
+                # Send everything that is due in one write when the sleep overshoots
+                due = int((now_ns - next_ns) // interval_ns) + 1
+                frames = [self.create_test_packet(packet_size, sequence + i) for i in range(due)]
+                send_ns = time.perf_counter_ns()
+                for i in range(due):
+                    send_times[sequence + i] = send_ns
+                self.arduino.write(b''.join(frames))
+                sequence += due
+                next_ns += due * interval_ns
+        finally:
+            done.set()
+    
+    def test_streaming(self, packet_size, rate_bps, duration_s=2.0, drain_s=0.5):
+        """Stream frames at rate_bps on a writer thread while echoes are consumed concurrently"""
+        print(f"\nStreaming {packet_size}-byte frames at {rate_bps:,.0f} bytes/sec for {duration_s:.1f}s...")
+        
+        results = {
+            'packet_size': packet_size,
+            'target_rate_bps': rate_bps,
+            'duration_s': duration_s,
+            'latency_histogram': LatencyHistogram(),
+            'frames_sent': 0,
+            'frames_received': 0,
+            'frames_lost': 0,
+            'gap_count': 0,
+            'reorder_count': 0,
+            'duplicate_count': 0,
+            'partial_count': 0,
+            'corruption_count': 0,
+            'total_bytes_received': 0,
+        }
+        
+        # Clear buffer before test
+        self.reader.clear()
+        self.receive_buffer.clear()
+        skipped_before = self.receive_buffer.skipped_bytes
+        
+        send_times = {}  # sequence number -> send time ns, shared with the writer thread
+        received = set()
+        next_expected = 0
+        done = threading.Event()
+        writer = threading.Thread(target=self._stream_writer, args=(packet_size, rate_bps, duration_s, send_times, done),
+                                  name=f"StreamWriter({self.port})", daemon=True)
+        
+        start_ns = time.perf_counter_ns()
+        last_echo_ns = start_ns
+        writer.start()
+        
+        # Consume echoes until the writer is done and the link has drained
+        drain_deadline_ns = None
+        while True:
+            if drain_deadline_ns is None and done.is_set():
+                drain_deadline_ns = time.perf_counter_ns() + int(drain_s * 1e9)
+            if drain_deadline_ns is not None and (time.perf_counter_ns() >= drain_deadline_ns or len(received) == len(send_times)):
+                break
+            
+            chunk = self.reader.get(0.05)
+            if chunk is None:
+                continue
+            arrival_ns, data = chunk
+            results['total_bytes_received'] += len(data)
+            self.receive_buffer.write(data)
+            
+            while True:
+                more_expected = not done.is_set() or len(send_times) - len(received) > 1
+                frame = self.receive_buffer.next_frame(lambda sequence, length: sequence in send_times, more_expected)
+                if frame is None:
+                    break
+                
+                sequence, received_packet, crc_ok = frame
+                if not crc_ok:
+                    # A frame cut short by lost bytes comes back shorter than the frames sent
+                    short = len(received_packet) != OVERHEAD + payload_size(packet_size)
+                    results['partial_count' if short else 'corruption_count'] += 1
+                    continue
+                if sequence not in send_times:
+                    continue
+                if sequence in received:
+                    results['duplicate_count'] += 1
+                    continue
+                
+                received.add(sequence)
+                results['latency_histogram'].record(arrival_ns - send_times[sequence])
+                last_echo_ns = arrival_ns
+                
+                if sequence > next_expected:
+                    results['gap_count'] += 1
+                elif sequence < next_expected:
+                    results['reorder_count'] += 1
+                next_expected = max(next_expected, sequence + 1)
+        
+        writer.join()
+        elapsed_s = (last_echo_ns - start_ns) / 1e9
+        
+        results['frames_sent'] = len(send_times)
+        results['frames_received'] = len(received)
+        results['frames_lost'] = results['frames_sent'] - results['frames_received']
+        results['loss_pct'] = (results['frames_lost'] / results['frames_sent']) * 100 if results['frames_sent'] else 0
+        results['skipped_bytes'] = self.receive_buffer.skipped_bytes - skipped_before
+        results['offered_bps'] = (results['frames_sent'] * packet_size) / duration_s
+        results['sustained_bps'] = (results['frames_received'] * packet_size) / elapsed_s if elapsed_s > 0 else 0
+        
+        histogram = results['latency_histogram']
+        for name, percent in PERCENTILES:
+            results[f'{name}_latency_ms'] = histogram.percentile(percent) / 1e6
+        
+        print(f"  Offered: {results['offered_bps']:.0f} B/s, Sustained: {results['sustained_bps']:.0f} B/s")
+        print(f"  Sent: {results['frames_sent']}, Received: {results['frames_received']}, Lost: {results['frames_lost']} ({results['loss_pct']:.1f}%)")
+        print(f"    Gaps: {results['gap_count']}, Reordered: {results['reorder_count']}, Partial: {results['partial_count']}, Corrupted: {results['corruption_count']}, Skipped bytes: {results['skipped_bytes']}")
+        print(f"    Latency p50/p99: {results['p50_latency_ms']:.3f}/{results['p99_latency_ms']:.3f}ms")
+        if self.sink:
+            self.sink.write(results, port=self.port, kind='streaming_test')
+        
+        return results
+    
+    def run_streaming_test(self, packet_size=63, rates_bps=None, duration_s=2.0, max_loss_pct=1.0):
+        """Ramp the streaming rate up to find where the echo loop saturates"""
         if not self.connect():
             return None
         
-        print("Arduino Packet Size and Timing Optimization")
+        rates_bps = rates_bps or self.STREAM_RATES_BPS
+        
+        print("Arduino Full-Duplex Streaming Test")
         print("=" * 60)
         print(f"Fixed baud rate: {self.BAUD_RATE:,}")
         print(f"Testing port: {self.port}")
         
+        all_results = []
+        try:
+            for rate_bps in rates_bps:
+                all_results.append(self.test_streaming(packet_size, rate_bps, duration_s))
+        except KeyboardInterrupt:
+            print("\nStreaming test interrupted by user")
+        
+        # Clean up
+        self.disconnect()
+        
+        print(f"\n{'='*100}")
+        print("STREAMING SUMMARY")
+        print(f"{'='*100}")
+        print(f"{'Target(B/s)':<12} {'Offered(B/s)':<13} {'Sustained(B/s)':<15} {'Loss%':<7} {'Gaps':<6} {'Reord':<6} {'p99(ms)':<8}")
+        print("-" * 80)
+        for result in all_results:
+            print(f"{result['target_rate_bps']:<12.0f} {result['offered_bps']:<13.0f} {result['sustained_bps']:<15.0f} "
+                  f"{result['loss_pct']:>5.1f}% {result['gap_count']:<6} {result['reorder_count']:<6} {result['p99_latency_ms']:>8.3f}")
+        
+        clean = [r for r in all_results if r['loss_pct'] <= max_loss_pct]
+        if clean:
+            saturation = max(clean, key=lambda x: x['sustained_bps'])
+            print(f"\n📈 Saturation point: {saturation['sustained_bps']:.0f} B/s sustained at {saturation['target_rate_bps']:.0f} B/s offered")
+            print(f"    ({saturation['loss_pct']:.1f}% loss, {saturation['p99_latency_ms']:.3f}ms p99 latency)")
+        else:
+            print(f"\nEvery rate lost more than {max_loss_pct:.1f}% of frames")
+        
+        return all_results
+    
+    def run_test(self, packet_size, num_packets, delay_between_ms, window_size=1):
+        """Run a stop-and-wait or pipelined test depending on window_size"""
+        if window_size > 1:
+            return self.test_packet_size_pipelined(packet_size, num_packets=num_packets, delay_between_ms=delay_between_ms, window_size=window_size)
+        return self.test_packet_size(packet_size, num_packets=num_packets, delay_between_ms=delay_between_ms)
+    
+    def run_optimization(self, window_size=1, print_summary=True):
+        """Run packet size optimization tests"""
+        if not self.connect():
+            return None
+        
+        self.log("Arduino Packet Size and Timing Optimization")
+        self.log("=" * 60)
+        self.log(f"Fixed baud rate: {self.BAUD_RATE:,}")
+        self.log(f"Testing port: {self.port}")
+        if window_size > 1:
+            self.log(f"Pipelined mode: {window_size} packets in flight")
+        
         # Test different packet sizes
-        packet_sizes = list(range(63, 64))
-        delays = [0, 1, 2, 3, 5, 10, 15, 25, 33, 47, 56]  # Different delays between packets
+        packet_sizes = self.PACKET_SIZES
+        delays = self.DELAYS_MS
         
         all_results = []
+        interrupted = False
         
         for delay in delays:
-            print(f"\n{'='*60}")
-            print(f"Testing with {delay}ms delay between packets")
-            print(f"{'='*60}")
+            if self.stop_event.is_set():
+                break
+            self.log(f"\n{'='*60}")
+            self.log(f"Testing with {delay}ms delay between packets")
+            self.log(f"{'='*60}")
             
             for packet_size in packet_sizes:
+                if self.stop_event.is_set():
+                    break
                 try:
-                    result = self.test_packet_size(packet_size, num_packets=256, delay_between_ms=delay)
+                    result = self.run_test(packet_size, self.PACKETS_PER_TEST, delay, window_size)
                     if result:
                         all_results.append(result)
                     
                 except KeyboardInterrupt:
                     print("\nOptimization interrupted by user")
+                    interrupted = True
                     break
                 except Exception as e:
-                    print(f"Error testing {packet_size} bytes: {e}")
+                    self.log(f"Error testing {packet_size} bytes: {e}")
             
-            if KeyboardInterrupt:
+            if interrupted:
                 break
         
         # Clean up
-        if self.arduino and self.arduino.is_open:
-            self.arduino.close()
+        self.disconnect()
         
-        self.print_optimization_summary(all_results)
+        if print_summary:
+            self.print_optimization_summary(all_results)
+        return all_results
+    
+    def run_adaptive_optimization(self, window_size=1, print_summary=True):
+        """Search for the best packet size and delay, stopping each test once it is settled"""
+        if not self.connect():
+            return None
+        
+        print("Arduino Packet Size and Timing Optimization (adaptive)")
+        print("=" * 60)
+        print(f"Fixed baud rate: {self.BAUD_RATE:,}")
+        print(f"Testing port: {self.port}")
+        if window_size > 1:
+            print(f"Pipelined mode: {window_size} packets in flight")
+        
+        # Let the search bisect over every frame size the firmware's 64-byte buffer can hold
+        search = AdaptiveSearch(self, window_size=window_size,
+                                packet_sizes=list(range(OVERHEAD + 1, 65)), max_packets=self.PACKETS_PER_TEST)
+        try:
+            all_results = search.run()
+        except KeyboardInterrupt:
+            print("\nOptimization interrupted by user")
+            all_results = list(search.cells.values())
+        
+        # Clean up
+        self.disconnect()
+        
+        if print_summary:
+            search.print_path()
+            self.print_optimization_summary(all_results)
         return all_results
     
     def print_optimization_summary(self, results):
@@ -267,8 +780,8 @@ class PacketOptimizer:
         
         for delay, group_results in delay_groups.items():
             print(f"\n--- Results with {delay}ms delay ---")
-            print(f"{'Size':<6} {'Success%':<9} {'Avg RT(ms)':<12} {'Throughput(B/s)':<15} {'T/P/C':<8}")
-            print("-" * 60)
+            print(f"{'Size':<6} {'Success%':<9} {'Avg RT(ms)':<12} {'p50(ms)':<10} {'p99(ms)':<10} {'p99.9(ms)':<10} {'Throughput(B/s)':<15} {'T/P/C':<8}")
+            print("-" * 90)
             
             # Sort by success rate, then by throughput
             sorted_results = sorted(group_results, key=lambda x: (x['success_rate'], x['effective_throughput_bps']), reverse=True)
@@ -280,7 +793,8 @@ class PacketOptimizer:
                 throughput = result['effective_throughput_bps']
                 errors = f"{result['timeout_count']}/{result['partial_count']}/{result['corruption_count']}"
                 
-                print(f"{size:<6} {success:>7.1f}% {avg_rt:>10.1f} {throughput:>13.0f} {errors:<8}")
+                tail = f"{result['p50_round_trip_ms']:>8.3f} {result['p99_round_trip_ms']:>10.3f} {result['p999_round_trip_ms']:>10.3f}"
+                print(f"{size:<6} {success:>7.1f}% {avg_rt:>10.3f} {tail} {throughput:>13.0f} {errors:<8}")
         
         # Overall recommendations
         print(f"\n{'='*100}")
@@ -299,7 +813,7 @@ class PacketOptimizer:
         if fast_reliable:
             fastest = min(fast_reliable, key=lambda x: x['avg_round_trip_ms'])
             print(f"⚡ Lowest Latency: {fastest['packet_size']} bytes, {fastest['delay_ms']}ms delay")
-            print(f"    ({fastest['avg_round_trip_ms']:.1f}ms avg, {fastest['success_rate']:.1f}% success)")
+            print(f"    ({fastest['avg_round_trip_ms']:.3f}ms avg, {fastest['p99_round_trip_ms']:.3f}ms p99, {fastest['success_rate']:.1f}% success)")
         
         # Find highest throughput overall
         if results:
@@ -308,19 +822,45 @@ class PacketOptimizer:
             print(f"    ({max_throughput['effective_throughput_bps']:.0f} B/s, {max_throughput['success_rate']:.1f}% success)")
 
 def main():
-    port = find_arduino()
+    parser = argparse.ArgumentParser(description="Arduino packet size and timing optimizer")
+    parser.add_argument('--window', type=int, default=1,
+                        help="Packets in flight per test (1 = stop-and-wait)")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="Search adaptively for the throughput knee instead of sweeping the full grid")
+    parser.add_argument('--stream', action='store_true',
+                        help="Ramp a continuous full-duplex stream to find the saturation point")
+    parser.add_argument('--port',
+                        help="Serial port to test, or sim://?... for the simulated device (default: auto-detect)")
+    parser.add_argument('--quiet', action='store_true',
+                        help="Don't print a line per packet")
+    parser.add_argument('--progress', action='store_true',
+                        help="Print aggregated progress about once a second instead of a line per packet")
+    parser.add_argument('--jsonl',
+                        help="Append every test result to this JSON Lines file")
+    args = parser.parse_args()
+    
+    port = args.port or find_arduino()
     if not port:
         print("No serial ports found!")
         return
     
+    sink = JsonlSink(args.jsonl) if args.jsonl else None
     try:
-        optimizer = PacketOptimizer(port)
-        optimizer.run_optimization()
+        optimizer = PacketOptimizer(port, verbose=not (args.quiet or args.progress), progress=args.progress, sink=sink)
+        if args.stream:
+            optimizer.run_streaming_test()
+        elif args.adaptive:
+            optimizer.run_adaptive_optimization(window_size=args.window)
+        else:
+            optimizer.run_optimization(window_size=args.window)
         
     except KeyboardInterrupt:
         print("\nOptimization stopped by user")
     except Exception as e:
         print(f"Error: {e}")
+    finally:
+        if sink:
+            sink.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,204 @@
+"""Adaptive search for the best packet size and delay
+
+Instead of measuring every cell of the size x delay grid at full length,
+AdaptiveSearch measures configurations in small batches and stops as soon
+as the result is statistically settled:
+
+- a configuration is unreliable once the upper bound of the Wilson score
+  interval on its success rate drops below the reliability threshold
+- it is reliable once the lower bound clears the threshold and the
+  confidence interval on its throughput is within throughput_tolerance
+
+The search then closes in on the throughput knee:
+
+1. bisect the delays at the largest packet size for the smallest delay
+   that stays reliable
+2. at the first delay below that knee, bisect the packet sizes for the
+   largest size that stays reliable
+3. run successive halving over the configurations around both knees,
+   doubling the packet budget each round, to pick the best throughput
+
+Every measurement step is recorded in path.
+"""
+import collections
+import math
+import statistics
+
+from histogram import LatencyHistogram
+from instrumentation import Instrumentation
+
+# Counters summed when two measurements of the same configuration are merged
+SUMMED_KEYS = ['num_packets', 'success_count', 'total_bytes_sent', 'total_bytes_received',
+               'corruption_count', 'timeout_count', 'partial_count', 'unmatched_count', 'measured_time_s',
+               'verified_count']
+
+def wilson_interval(successes, trials, z=1.96):
+    """Wilson score confidence interval for a success proportion"""
+    if trials == 0:
+        return 0.0, 1.0
+
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(centre - half_width, 0.0), min(centre + half_width, 1.0)
+
+class AdaptiveSearch:
+    def __init__(self, optimizer, window_size=1, packet_sizes=None, delays_ms=None,
+                 reliability_threshold=95.0, batch_size=16, max_packets=256,
+                 throughput_tolerance=0.05, z=1.96):
+        self.optimizer = optimizer
+        self.window_size = window_size
+        self.packet_sizes = sorted(packet_sizes or optimizer.PACKET_SIZES)
+        self.delays_ms = sorted(delays_ms or optimizer.DELAYS_MS)
+        self.reliability_threshold = reliability_threshold
+        self.batch_size = batch_size
+        self.max_packets = max_packets
+        self.throughput_tolerance = throughput_tolerance
+        self.z = z
+
+        self.cells = {}  # (packet size, delay) -> accumulated results
+        self.path = []
+
+    def merge_results(self, total, batch):
+        """Fold a new batch into the accumulated results for a configuration"""
+        merged = dict(total)
+        for key in SUMMED_KEYS:
+            merged[key] = total.get(key, 0) + batch.get(key, 0)
+
+        merged['latency_histogram'] = LatencyHistogram().merge(total['latency_histogram']).merge(batch['latency_histogram'])
+        failures = batch['recent_failures']
+        merged['recent_failures'] = collections.deque(total['recent_failures'], maxlen=failures.maxlen)
+        merged['recent_failures'].extend(failures)
+        merged['batch_throughputs'] = total['batch_throughputs'] + batch['batch_throughputs']
+        if 'instrumentation' in total:
+            merged['instrumentation'] = Instrumentation().merge(total['instrumentation']).merge(batch['instrumentation'])
+
+        self.optimizer.calculate_statistics(merged)
+        measured_time_s = merged['measured_time_s']
+        merged['effective_throughput_bps'] = (merged['total_bytes_sent'] * 2) / measured_time_s if measured_time_s > 0 else 0
+        if 'sustained_throughput_bps' in merged:
+            merged['sustained_throughput_bps'] = (merged['success_count'] * merged['packet_size']) / measured_time_s if measured_time_s > 0 else 0
+        return merged
+
+    def verdict(self, cell):
+        """'reliable', 'unreliable' or 'unsettled' for the measurements so far"""
+        threshold = self.reliability_threshold / 100.0
+        lower, upper = wilson_interval(cell['success_count'], cell['num_packets'], self.z)
+
+        if cell['num_packets'] >= self.max_packets:
+            return 'reliable' if cell['success_rate'] >= self.reliability_threshold else 'unreliable'
+        if upper < threshold:
+            return 'unreliable'
+        if lower < threshold:
+            return 'unsettled'
+
+        throughputs = cell['batch_throughputs']
+        if len(throughputs) < 3:
+            return 'unsettled'
+        mean = statistics.mean(throughputs)
+        half_width = self.z * statistics.stdev(throughputs) / math.sqrt(len(throughputs))
+        return 'reliable' if mean > 0 and half_width / mean <= self.throughput_tolerance else 'unsettled'
+
+    def measure(self, phase, packet_size, delay_ms, min_packets=0):
+        """Measure a configuration in batches until it is settled and has min_packets"""
+        key = (packet_size, delay_ms)
+        cell = self.cells.get(key)
+
+        while cell is None or cell['num_packets'] < self.max_packets:
+            if cell is not None and cell['num_packets'] >= min_packets and self.verdict(cell) != 'unsettled':
+                break
+
+            num_packets = min(self.batch_size, self.max_packets - (cell['num_packets'] if cell else 0))
+            batch = self.optimizer.run_test(packet_size, num_packets, delay_ms, self.window_size)
+            batch['batch_throughputs'] = [batch['effective_throughput_bps']]
+            cell = batch if cell is None else self.merge_results(cell, batch)
+
+        self.cells[key] = cell
+        verdict = self.verdict(cell)
+        self.path.append({
+            'phase': phase,
+            'packet_size': packet_size,
+            'delay_ms': delay_ms,
+            'packets': cell['num_packets'],
+            'success_rate': cell['success_rate'],
+            'effective_throughput_bps': cell['effective_throughput_bps'],
+            'verdict': verdict,
+        })
+        return verdict == 'reliable'
+
+    def bisect(self, values, is_reliable):
+        """Index of the reliability boundary in values, assuming reliability is monotonic
+
+        is_reliable(value) is expected to be false below the boundary and
+        true at and above it. Returns len(values) if nothing is reliable.
+        """
+        low, high = -1, len(values)
+        if not is_reliable(values[-1]):
+            return len(values)
+        high = len(values) - 1
+
+        while high - low > 1:
+            middle = (low + high) // 2
+            if is_reliable(values[middle]):
+                high = middle
+            else:
+                low = middle
+        return high
+
+    def successive_halving(self, candidates):
+        """Keep the better half of candidates by throughput, doubling the budget each round"""
+        budget = self.batch_size * 4
+        while len(candidates) > 1 and budget < self.max_packets:
+            for packet_size, delay_ms in candidates:
+                self.measure('halving', packet_size, delay_ms, min_packets=budget)
+
+            ranked = sorted(candidates, key=lambda c: (self.verdict(self.cells[c]) == 'reliable', self.cells[c]['effective_throughput_bps']), reverse=True)
+            candidates = ranked[:max(len(ranked) // 2, 1)]
+            budget *= 2
+
+        best = candidates[0]
+        self.measure('final', best[0], best[1], min_packets=self.max_packets)
+        return best
+
+    def run(self):
+        """Search for the throughput knee and return the measured results"""
+        largest = self.packet_sizes[-1]
+
+        # 1. Smallest reliable delay at the largest packet size
+        delay_index = self.bisect(self.delays_ms, lambda delay: self.measure('delay', largest, delay))
+        candidates = []
+        if delay_index < len(self.delays_ms):
+            candidates.append((largest, self.delays_ms[delay_index]))
+            if delay_index + 1 < len(self.delays_ms):
+                candidates.append((largest, self.delays_ms[delay_index + 1]))
+
+        # 2. Largest reliable packet size just below the delay knee
+        faster_delay = self.delays_ms[delay_index - 1] if 0 < delay_index <= len(self.delays_ms) else None
+        if faster_delay is not None and len(self.packet_sizes) > 1:
+            # Bisect on descending sizes so "reliable" is the upper side of the boundary
+            sizes = self.packet_sizes[::-1]
+            size_index = self.bisect(sizes, lambda size: self.measure('size', size, faster_delay))
+            if size_index < len(sizes):
+                candidates.append((sizes[size_index], faster_delay))
+
+        # 3. Pick the best of the reliable configurations around the knees
+        candidates = [c for c in dict.fromkeys(candidates) if c not in self.cells or self.verdict(self.cells[c]) != 'unreliable']
+        if candidates:
+            self.successive_halving(candidates)
+
+        return list(self.cells.values())
+
+    def print_path(self):
+        """Print every measurement step the search took"""
+        print(f"\n{'='*100}")
+        print("ADAPTIVE SEARCH PATH")
+        print(f"{'='*100}")
+        print(f"{'Step':<5} {'Phase':<8} {'Size':<6} {'Delay':<6} {'Packets':<8} {'Success%':<9} {'Throughput(B/s)':<16} {'Verdict':<10}")
+        print("-" * 80)
+        for step, entry in enumerate(self.path, 1):
+            print(f"{step:<5} {entry['phase']:<8} {entry['packet_size']:<6} {entry['delay_ms']:<6} {entry['packets']:<8} "
+                  f"{entry['success_rate']:>7.1f}% {entry['effective_throughput_bps']:>15.0f} {entry['verdict']:<10}")
+
+        total_packets = sum(cell['num_packets'] for cell in self.cells.values())
+        print(f"\n{len(self.cells)} configurations, {total_packets} packets measured")
@@ -0,0 +1,221 @@
+"""Simulated table firmware for benchmarking without hardware
+
+SimulatedArduino implements the subset of the pyserial Serial interface
+used by PacketOptimizer and models the echo loop in table_real.ino:
+
+- bytes travel at the configured baud rate (10 bits per byte, 8N1)
+- the firmware loop only services the port once every loop_period_s, so
+  bytes pile up in the rx_buffer_size byte receive buffer in between and
+  anything that arrives while it is full is lost
+- each loop echoes at most one 64 byte chunk back, with optional per-byte
+  processing latency, random drops and random corruption
+
+Point PacketOptimizer at it with a sim:// port, for example
+    sim://?loop_period_ms=3&drop_rate=0.001&seed=1
+"""
+import math
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qsl, urlsplit
+
+
+class SimulatedArduino:
+    """In-process stand-in for a serial.Serial connected to the table firmware"""
+
+    # URL query parameter -> (constructor argument, type, scale)
+    URL_PARAMETERS = {
+        'baudrate': ('baudrate', int, 1),
+        'rx_buffer': ('rx_buffer_size', int, 1),
+        'loop_period_ms': ('loop_period_s', float, 1e-3),
+        'byte_latency_us': ('byte_latency_s', float, 1e-6),
+        'link_latency_us': ('link_latency_s', float, 1e-6),
+        'drop_rate': ('drop_rate', float, 1),
+        'corrupt_rate': ('corrupt_rate', float, 1),
+        'seed': ('seed', int, 1),
+    }
+
+    def __init__(self, port="sim://", baudrate=2000000, timeout=None, rx_buffer_size=64,
+                 loop_period_s=0.003, byte_latency_s=0.0, link_latency_s=0.0,
+                 drop_rate=0.0, corrupt_rate=0.0, seed=None):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.rx_buffer_size = rx_buffer_size
+        self.loop_period_s = loop_period_s
+        self.byte_latency_s = byte_latency_s
+        self.link_latency_s = link_latency_s
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.byte_time_s = 10 / baudrate
+        self.is_open = True
+
+        self.stats = {
+            'bytes_written': 0,
+            'bytes_echoed': 0,
+            'bytes_overrun': 0,
+            'bytes_dropped': 0,
+            'bytes_corrupted': 0,
+            'loop_iterations': 0,
+        }
+
+        self._random = random.Random(seed)
+        self._condition = threading.Condition()
+        self._to_device = deque()   # [arrival time of first byte, bytes] on the host -> device wire
+        self._to_host = deque()     # [arrival time of first byte, bytes] on the device -> host wire
+        self._host_tx_free = 0.0    # when the host -> device wire is next idle
+        self._device_tx_free = 0.0  # when the device -> host wire is next idle
+        self._rx_buffer = bytearray()
+        self._received = bytearray()
+        self._epoch = time.perf_counter()
+        self._next_loop = self._epoch
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        """Create a simulator from a sim://?name=value&... URL"""
+        parts = urlsplit(url)
+        if parts.scheme != 'sim':
+            raise ValueError(f"Not a simulator URL: {url}")
+
+        for name, value in parse_qsl(parts.query):
+            if name not in cls.URL_PARAMETERS:
+                raise ValueError(f"Unknown simulator parameter: {name}")
+            argument, kind, scale = cls.URL_PARAMETERS[name]
+            kwargs[argument] = kind(value) * scale
+
+        return cls(port=url, **kwargs)
+
+    # --- Simulation ------------------------------------------------------
+
+    def _arrived(self, wire, now):
+        """Pop every byte on wire that has arrived by now"""
+        arrived = bytearray()
+        while wire:
+            first, data = wire[0]
+            if first > now:
+                break
+            count = min(len(data), int((now - first) / self.byte_time_s) + 1)
+            arrived += data[:count]
+            if count == len(data):
+                wire.popleft()
+            else:
+                wire[0] = [first + count * self.byte_time_s, data[count:]]
+        return arrived
+
+    def _run_loop(self, loop_time):
+        """One iteration of the firmware loop at loop_time"""
+        self.stats['loop_iterations'] += 1
+
+        # Everything that arrived since the last iteration lands in the
+        # receive buffer; once it is full the rest is overrun
+        arrived = self._arrived(self._to_device, loop_time)
+        space = self.rx_buffer_size - len(self._rx_buffer)
+        self._rx_buffer += arrived[:space]
+        self.stats['bytes_overrun'] += max(len(arrived) - space, 0)
+
+        if not self._rx_buffer:
+            return
+
+        chunk = self._rx_buffer[:64]
+        del self._rx_buffer[:64]
+
+        if self.drop_rate > 0 or self.corrupt_rate > 0:
+            echoed = bytearray()
+            for byte in chunk:
+                if self._random.random() < self.drop_rate:
+                    self.stats['bytes_dropped'] += 1
+                    continue
+                if self._random.random() < self.corrupt_rate:
+                    byte ^= 1 << self._random.randrange(8)
+                    self.stats['bytes_corrupted'] += 1
+                echoed.append(byte)
+            chunk = echoed
+
+        if not chunk:
+            return
+
+        start = max(loop_time + len(chunk) * self.byte_latency_s, self._device_tx_free)
+        self._device_tx_free = start + len(chunk) * self.byte_time_s
+        self._to_host.append([start + self.byte_time_s + self.link_latency_s, bytes(chunk)])
+        self.stats['bytes_echoed'] += len(chunk)
+
+    def _advance(self, now):
+        """Run every firmware loop iteration due by now"""
+        while self._next_loop <= now:
+            if not self._to_device and not self._rx_buffer:
+                # Idle: jump straight to the first iteration after now
+                periods = math.floor((now - self._next_loop) / self.loop_period_s) + 1
+                self._next_loop += periods * self.loop_period_s
+                break
+            self._run_loop(self._next_loop)
+            self._next_loop += self.loop_period_s
+
+        self._received += self._arrived(self._to_host, now)
+
+    def _next_event(self):
+        """Time at which more data could next reach the host, or None"""
+        if self._to_host:
+            return self._to_host[0][0]
+        if self._to_device or self._rx_buffer:
+            return self._next_loop
+        return None
+
+    # --- pyserial interface ----------------------------------------------
+
+    @property
+    def in_waiting(self):
+        with self._condition:
+            self._advance(time.perf_counter())
+            return len(self._received)
+
+    def write(self, data):
+        if not self.is_open:
+            raise OSError("Port is closed")
+
+        data = bytes(data)
+        with self._condition:
+            now = time.perf_counter()
+            self._advance(now)
+            start = max(now, self._host_tx_free)
+            self._host_tx_free = start + len(data) * self.byte_time_s
+            self._to_device.append([start + self.byte_time_s + self.link_latency_s, data])
+            self.stats['bytes_written'] += len(data)
+            self._condition.notify_all()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def read(self, size=1):
+        if not self.is_open:
+            raise OSError("Port is closed")
+
+        deadline = None if self.timeout is None else time.perf_counter() + self.timeout
+        with self._condition:
+            while True:
+                now = time.perf_counter()
+                self._advance(now)
+                if len(self._received) >= size or not self.is_open:
+                    break
+                if deadline is not None and now >= deadline:
+                    break
+
+                wake = self._next_event()
+                if deadline is not None:
+                    wake = deadline if wake is None else min(wake, deadline)
+                self._condition.wait(None if wake is None else max(wake - now, 0))
+
+            data = bytes(self._received[:size])
+            del self._received[:size]
+            return data
+
+    def reset_input_buffer(self):
+        with self._condition:
+            self._advance(time.perf_counter())
+            self._received.clear()
+
+    def close(self):
+        with self._condition:
+            self.is_open = False
+            self._condition.notify_all()
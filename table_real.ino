@@ -148,11 +148,17 @@ int main()
         if (Serial.available() > 0)
         {
             Array<char, 64> buf {};
-            buf.fill(0);
 
-            Serial.readBytes(buf.data(), Serial.available());
+            // Echo raw bytes so binary test frames (which contain zeros) survive
+            size_t count = static_cast<size_t>(Serial.available());
+            if (count > buf.size())
+            {
+                count = buf.size();
+            }
+
+            count = Serial.readBytes(buf.data(), count);
             
-            Serial.print(buf.data());
+            Serial.write(buf.data(), count);
         }
         
         if (const ButtonReader::ButtonReadResult r = buttonReader.read(); r.is_valid())
@@ -0,0 +1,23 @@
+import pytest
+
+import benchmarks
+
+def document(quick=False, group='packets', **values):
+    metrics = {name: {**benchmarks.metric(value, 'ms', False), 'group': group} for name, value in values.items()}
+    return {'machine': 'test', 'quick': quick, 'groups': [group], 'metrics': metrics}
+
+def test_compare_flags_regressions_and_missing_metrics(capsys):
+    baseline = document(fast=1.0, slow=1.0, dropped=1.0)
+    current = document(fast=1.1, slow=2.0, added=1.0)
+    assert benchmarks.compare(baseline, current, threshold=0.2) == ['slow', 'dropped']
+    assert 'missing' in capsys.readouterr().out
+
+def test_compare_ignores_groups_the_run_left_out():
+    baseline = document(fast=1.0)
+    baseline['metrics'].update(document(group='magnets', sweep=1.0)['metrics'])
+    baseline['groups'].append('magnets')
+    assert benchmarks.compare(baseline, document(fast=1.0)) == []
+
+def test_compare_refuses_quick_against_full():
+    with pytest.raises(ValueError, match='quick run against a full baseline'):
+        benchmarks.compare(document(a=1.0), document(quick=True, a=1.0))
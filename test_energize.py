@@ -0,0 +1,22 @@
+import numpy as np
+
+import energize
+
+def counterexample():
+    contributions = np.zeros((energize.FACES, 6))
+    contributions[0] = [1, 0, 0, 0, 0, -0.2]
+    contributions[1] = [0.1, 0, 0, 0, 0, 0.1]
+    return contributions
+
+def test_plan_finds_a_feasible_assignment_that_is_not_the_closest():
+    # Face 0 alone is closest in force but its torque is out of tolerance; face 1 alone is feasible
+    plan = energize.plan_assignment(counterexample(), (1, 0, 0), (0, 0, 1), force_tolerance=0.95, torque_tolerance=0.95)
+    assert plan['feasible']
+    assert plan['power_w'] == 1
+    np.testing.assert_array_equal(plan['states'][:2], [0, 1])
+
+def test_plan_falls_back_to_the_closest_assignment():
+    plan = energize.plan_assignment(counterexample(), (5, 0, 0), (0, 0, 0), force_tolerance=0.1, torque_tolerance=0.1)
+    assert not plan['feasible']
+    np.testing.assert_array_equal(plan['states'][:2], [1, 1])
+    np.testing.assert_allclose(plan['force_error'], 3.9, rtol=1e-6)
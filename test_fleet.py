@@ -0,0 +1,18 @@
+import asyncio
+import os
+import threading
+
+import fleet
+
+def test_fleet_runs_every_port_at_once(monkeypatch):
+    # More ports than asyncio's default executor has threads; each run waits until all have started
+    ports = [f"sim://?seed={index}" for index in range(min(32, (os.cpu_count() or 1) + 4) + 2)]
+    barrier = threading.Barrier(len(ports), timeout=10)
+
+    def run_optimization(self, window_size=1, print_summary=True):
+        barrier.wait()
+        return [{'packet_size': 63, 'window_size': window_size}]
+
+    monkeypatch.setattr(fleet.PacketOptimizer, 'run_optimization', run_optimization)
+    results = asyncio.run(fleet.optimize_fleet(ports))
+    assert all(results[port] == [{'packet_size': 63, 'window_size': 1, 'port': port}] for port in ports)
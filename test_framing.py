@@ -0,0 +1,67 @@
+import pytest
+
+from framing import FrameBuffer, make_test_frame
+
+FRAME_SIZE = 32
+
+def frames_with_damage(damage):
+    frames = [bytearray(make_test_frame(FRAME_SIZE, sequence)) for sequence in range(10)]
+    damage(frames[5])
+    return frames
+
+def drain(buffer, is_expected=None, more_expected=False):
+    found = []
+    while (frame := buffer.next_frame(is_expected, more_expected)) is not None:
+        sequence, data, crc_ok = frame
+        found.append((sequence, len(data), crc_ok))
+    return found
+
+def lose_byte(frame):
+    del frame[10]
+
+def flip_byte(frame):
+    frame[10] ^= 0xFF
+
+@pytest.mark.parametrize('one_write', [True, False])
+def test_lost_byte_does_not_take_the_next_frame(one_write):
+    buffer = FrameBuffer()
+    found = []
+    frames = frames_with_damage(lose_byte)
+    for data in [b''.join(frames)] if one_write else frames:
+        buffer.write(data)
+        found += drain(buffer, lambda sequence, length: sequence < 10)
+
+    assert [sequence for sequence, _, _ in found] == list(range(10))
+    assert found[5] == (5, FRAME_SIZE - 1, False)
+    assert all(crc_ok and size == FRAME_SIZE for sequence, size, crc_ok in found if sequence != 5)
+
+def test_lost_byte_without_predicate_skips_the_frame():
+    buffer = FrameBuffer()
+    buffer.write(b''.join(frames_with_damage(lose_byte)))
+    assert [sequence for sequence, _, _ in drain(buffer)] == [0, 1, 2, 3, 4, 6, 7, 8, 9]
+
+def test_corrupted_byte_returns_the_whole_frame():
+    buffer = FrameBuffer()
+    buffer.write(b''.join(frames_with_damage(flip_byte)))
+    found = drain(buffer, lambda sequence, length: sequence < 10)
+    assert [sequence for sequence, _, _ in found] == list(range(10))
+    assert found[5] == (5, FRAME_SIZE, False)
+    assert buffer.skipped_bytes == 0
+
+def test_corrupted_last_frame_is_returned_without_waiting():
+    buffer = FrameBuffer()
+    buffer.write(frames_with_damage(flip_byte)[5])
+    assert drain(buffer, lambda sequence, length: sequence == 5) == [(5, FRAME_SIZE, False)]
+
+def test_lost_byte_at_a_read_boundary_waits_when_more_frames_are_due():
+    # The read ends FRAME_SIZE bytes into frame 5, one byte into frame 6
+    stream = b''.join(frames_with_damage(lose_byte))
+    split = 5 * FRAME_SIZE + FRAME_SIZE
+    buffer = FrameBuffer()
+    found = []
+    for data in (stream[:split], stream[split:]):
+        buffer.write(data)
+        found += drain(buffer, lambda sequence, length: sequence < 10, more_expected=True)
+
+    assert [sequence for sequence, _, _ in found] == list(range(10))
+    assert found[5] == (5, FRAME_SIZE - 1, False)
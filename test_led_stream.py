@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+import led_stream
+from framing import HEADER, TRAILER, check_frame, encode_frame
+
+def apply_messages(frame, previous):
+    """Encode frame against previous as framed messages and decode them onto a copy of previous"""
+    messages = [encode_frame(number, payload) for number, payload in enumerate(led_stream.encode_update(frame, previous))]
+    assert all(len(message) <= led_stream.MAX_MESSAGE_SIZE and check_frame(message) for message in messages)
+
+    decoded = np.zeros_like(frame) if previous is None else previous.copy()
+    for message in messages:
+        led_stream.decode_update(message[HEADER.size:-TRAILER.size], decoded)
+    return decoded, messages
+
+def random_frames(rng):
+    previous = rng.integers(0, 256, size=(led_stream.NUMBER_OF_LEDS, 3), dtype=np.uint8)
+    frame = previous.copy()
+    # Scattered single changes, a solid run and a changed block of noise
+    frame[rng.choice(led_stream.NUMBER_OF_LEDS, 10, replace=False)] = rng.integers(0, 256, size=(10, 3))
+    start = rng.integers(0, led_stream.NUMBER_OF_LEDS - 20)
+    frame[start:start + 20] = rng.integers(0, 256, size=3)
+    start = rng.integers(0, led_stream.NUMBER_OF_LEDS - 15)
+    frame[start:start + 15] = rng.integers(0, 256, size=(15, 3))
+    return previous, frame
+
+@pytest.mark.parametrize('seed', range(20))
+def test_keyframe_and_delta_round_trip(seed):
+    previous, frame = random_frames(np.random.default_rng(seed))
+
+    decoded, messages = apply_messages(frame, None)
+    np.testing.assert_array_equal(decoded, frame)
+    assert len(messages) > 1  # Random colours do not fit one 64 byte message
+
+    decoded, _ = apply_messages(frame, previous)
+    np.testing.assert_array_equal(decoded, frame)
+
+def test_unchanged_frame_sends_nothing():
+    frame = led_stream.fire(np.float32(0.5))
+    assert led_stream.encode_update(frame, frame.copy()) == []
+
+@pytest.mark.parametrize('pattern', led_stream.PATTERNS, ids=lambda pattern: pattern.__name__)
+def test_patterns_round_trip(pattern):
+    # The first frame is a keyframe, then each one is a delta against what the table shows
+    shown = None
+    for t in np.arange(0, 1, 1 / 15, dtype=np.float32):
+        frame = pattern(t)
+        shown, _ = apply_messages(frame, shown)
+        np.testing.assert_array_equal(shown, frame)
@@ -0,0 +1,16 @@
+import numpy as np
+
+import magnet_grid
+import magnet_model
+
+def test_overlap_field_marks_intersecting_rows(tmp_path):
+    grid = magnet_grid.make_grid([1.0, 3.0, 10.0], [0.0, 30.0], meshings=[27])
+    magnet_grid.run_grid(grid, 'centered', workers=1, checkpoint_dir=str(tmp_path))
+    expected = magnet_model.overlapping(grid['gap_mm'], grid['angle_deg'], 'centered')
+    np.testing.assert_array_equal(grid['overlap'], expected)
+    assert grid['overlap'].any() and not grid['overlap'].all()
+
+    # Rows loaded from checkpoints are flagged too
+    resumed = magnet_grid.make_grid([1.0, 3.0, 10.0], [0.0, 30.0], meshings=[27])
+    magnet_grid.run_grid(resumed, 'centered', workers=1, checkpoint_dir=str(tmp_path))
+    np.testing.assert_array_equal(resumed['overlap'], expected)
@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+import pytest
+
+import magnet_dipole
+import magnet_model
+
+@pytest.mark.parametrize('layout', sorted(magnet_model.LAYOUTS))
+def test_target_polarization_follows_pol_T(layout):
+    gaps, angles = [2.0, 60.0], 30.0
+    pol_T = 0.9
+
+    meshed = magnet_model.sweep_ft(gaps, angles, layout, pol_T=pol_T, meshing=27)
+    explicit = magnet_model.sweep_ft(gaps, angles, layout, pol_T=pol_T, meshing=27,
+                                     target_pol_T=magnet_model.LAYOUTS[layout] * pol_T)
+    np.testing.assert_allclose(meshed, explicit)
+
+    # Both magnets scale with pol_T, so force and torque scale with its square
+    default = magnet_model.sweep_ft(gaps, angles, layout, meshing=27)
+    np.testing.assert_allclose(meshed, default * (pol_T / magnet_model.MAGNET_POL_T) ** 2, rtol=1e-9, atol=1e-9)
+
+@pytest.mark.parametrize('layout', sorted(magnet_model.LAYOUTS))
+def test_fast_sweep_defaults_match_sweep(layout):
+    gaps, angles = [2.0, 60.0], 30.0
+    pol_T = 0.9
+
+    meshed = magnet_model.sweep_ft(gaps, angles, layout, pol_T=pol_T, meshing=27)
+    exact, _, _ = magnet_dipole.fast_sweep_ft(gaps, angles, layout, tolerance=0.0, pol_T=pol_T, meshing=27)
+    np.testing.assert_allclose(exact, meshed)
+
+    # Far apart the dipole path must agree in sign and size, not only the meshed fallback
+    dipole, error, used_exact = magnet_dipole.fast_sweep_ft(gaps, angles, layout, tolerance=0.1, pol_T=pol_T, meshing=27)
+    assert not used_exact[1]
+    np.testing.assert_allclose(dipole[1, 0], meshed[1, 0], rtol=error[1], atol=1e-9)
+
+def test_overlapping_configurations():
+    # Centered at 30 degrees the source's rim cuts into the target's end face below about 2 mm
+    assert list(magnet_model.overlapping([1.0, 3.0, 10.0], 30.0, 'centered')) == [True, False, False]
+    assert not magnet_model.overlapping([1.0, 10.0], 0.0, 'hinged').any()
+
+def test_refine_flags_overlap_and_unconverged():
+    with pytest.warns(UserWarning) as record:
+        ft, meshing, error, converged = magnet_model.refine_ft([1.0, 3.0], 30.0, 'centered', tolerance=1e-6,
+                                                               max_meshing=100)
+    messages = ' '.join(str(warning.message) for warning in record)
+    assert 'overlapping' in messages and 'did not converge' in messages
+    assert np.isnan(ft[0]).all() and np.isfinite(ft[1]).all()
+    assert not converged.any()
+
+def test_cli_rejects_mismatched_gap_and_angle_lists(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        magnet_model.run_cli('centered', 1.0, 30.0, "test", argv=['--gap', '2', '3', '--angle', '10', '20', '30'])
+    assert exit_info.value.code == 2
+    assert '--gap has 2 values and --angle 3' in capsys.readouterr().err
+
+@pytest.mark.parametrize('layout, summary', [('centered', 'Primary Attractive Force:'),
+                                             ('hinged', 'Attractive Force Component (Z-axis):')])
+def test_cli_keeps_each_scripts_summary(layout, summary, capsys):
+    magnet_model.run_cli(layout, 10.0, 30.0, "test", argv=['--gap', '10', '20', '--angle', '30', '--meshing', '27'])
+    out = capsys.readouterr().out
+    assert out.count(summary) == 2
+
+def test_cli_refine_reports_unconverged_on_stderr(capsys):
+    magnet_model.run_cli('centered', 1.0, 30.0, "test", argv=['--gap', '1', '10', '--refine', '1e-12', '--json', '-'])
+    captured = capsys.readouterr()
+    assert '1 mm, 30 degrees: the magnets overlap' in captured.err
+    assert '10 mm, 30 degrees: not converged to 1e-12' in captured.err
+    assert json.loads(captured.out)['converged'] == [False, False]
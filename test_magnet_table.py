@@ -0,0 +1,28 @@
+import numpy as np
+
+import magnet_model
+import magnet_table
+
+def test_overlapping_cells_are_nan_and_flagged(tmp_path):
+    path = str(tmp_path / 'table.npy')
+    gaps, angles = magnet_table.gap_axis(1.0, 10.0, 4), np.array([0.0, 30.0])
+    magnet_table.build_table(path, gaps, angles, 'centered', meshing=27, workers=1)
+    table = magnet_table.LookupTable(path)
+
+    gap_grid, angle_grid = (axis.ravel() for axis in np.meshgrid(gaps, angles, indexing='ij'))
+    expected = magnet_model.overlapping(gap_grid, angle_grid, 'centered')
+    assert expected.any() and not expected.all()
+    np.testing.assert_array_equal(table.overlap.ravel(), expected)
+
+    # Grid points: overlapping ones have no value, the rest match the model (both signs)
+    np.testing.assert_array_equal(table.overlapping(gap_grid, angle_grid), expected)
+    ft = table.query(gap_grid, angle_grid)
+    assert np.isnan(ft[expected]).all()
+    np.testing.assert_allclose(ft[~expected], magnet_model.sweep_ft(gap_grid[~expected], angle_grid[~expected],
+                                                                    'centered', meshing=27))
+    np.testing.assert_allclose(table.query(gap_grid[~expected], angle_grid[~expected], -1), -ft[~expected])
+
+    # Between an overlapping and a clean point the query is flagged
+    first = np.argmax(expected)
+    between = (gap_grid[first] * 1.1, angle_grid[first])
+    assert table.overlapping(*between)[0] and np.isnan(table.query(*between)).all()
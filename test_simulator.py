@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from main import PacketOptimizer
+
+FRAME_SIZE = 63
+NUM_PACKETS = 40
+SEED, DROP_RATE, CORRUPT_RATE = 6, 0.0004, 0.0008
+
+def damaged_bytes(seed, drop_rate, corrupt_rate, count):
+    """Replay the simulator's per-byte random draws: (dropped, corrupted) byte indices of the echo"""
+    rng = random.Random(seed)
+    dropped, corrupted = [], []
+    for index in range(count):
+        if rng.random() < drop_rate:
+            dropped.append(index)
+            continue
+        if rng.random() < corrupt_rate:
+            rng.randrange(8)
+            corrupted.append(index)
+    return dropped, corrupted
+
+@pytest.mark.parametrize('window_size', [1, 4])
+def test_run_test_counts_match_simulator_stats(window_size):
+    dropped, corrupted = damaged_bytes(SEED, DROP_RATE, CORRUPT_RATE, FRAME_SIZE * NUM_PACKETS)
+    dropped_frames = {index // FRAME_SIZE for index in dropped}
+    corrupted_frames = {index // FRAME_SIZE for index in corrupted}
+    # The seed damages payload bytes of distinct frames, none of them the last one
+    assert dropped_frames and corrupted_frames and not dropped_frames & corrupted_frames
+    assert len(dropped_frames) == len(dropped) and len(corrupted_frames) == len(corrupted)
+    assert max(dropped_frames | corrupted_frames) < NUM_PACKETS - 1
+
+    optimizer = PacketOptimizer(f"sim://?seed={SEED}&drop_rate={DROP_RATE}&corrupt_rate={CORRUPT_RATE}"
+                                f"&loop_period_ms=0.05&rx_buffer=4096", verbose=False)
+    assert optimizer.connect()
+    try:
+        results = optimizer.run_test(FRAME_SIZE, NUM_PACKETS, 0, window_size)
+    finally:
+        optimizer.disconnect()
+    stats = optimizer.arduino.stats
+
+    assert stats['bytes_written'] == FRAME_SIZE * NUM_PACKETS
+    assert stats['bytes_overrun'] == 0
+    assert stats['bytes_dropped'] == len(dropped)
+    assert stats['bytes_corrupted'] == len(corrupted)
+    assert stats['bytes_echoed'] == stats['bytes_written'] - stats['bytes_dropped']
+
+    # A dropped byte loses only its own frame: a timeout when nothing follows it, otherwise a short frame
+    lost = 'timeout_count' if window_size == 1 else 'partial_count'
+    assert results[lost] == len(dropped_frames)
+    assert results['corruption_count'] == len(corrupted_frames)
+    assert results['timeout_count'] + results['partial_count'] == len(dropped_frames)
+    assert results['success_count'] == NUM_PACKETS - len(dropped_frames) - len(corrupted_frames)
+    assert results['verified_count'] == NUM_PACKETS